@@ -1,5 +1,20 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_migrate
+
+
+def clear_caches(**kwargs):
+    """Кэш в файле переживает перезапуск: после migrate в нём могут
+    лежать объекты моделей со старой схемой."""
+    for alias in settings.CACHES:
+        caches[alias].clear()
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        post_migrate.connect(
+            clear_caches, sender=self, dispatch_uid='core.clear_caches'
+        )
@@ -0,0 +1,289 @@
+"""Кэш в файле SQLite, общий для всех процессов на одной машине.
+
+LocMemCache у каждого процесса свой, и сброс версии в одном воркере
+не доходит до остальных. SQLiteCache хранит записи в одной таблице файла
+LOCATION в режиме WAL: читатели не блокируют писателя, а запись идёт
+короткими транзакциями.
+
+Поддерживает TTL, атомарные add/incr, get_many/set_many одним запросом
+и вытеснение давно не читанных записей (LRU), когда записей больше
+MAX_ENTRIES. Подключение в формате CACHES:
+
+    'default': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': '/var/tmp/yatube-cache.sqlite3',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    }
+
+Дополнительные OPTIONS: CULL_EVERY - через сколько записей процесса
+проверять размер (между проверками предел может быть превышен),
+LRU_RESOLUTION - не чаще скольких секунд обновлять время чтения записи.
+
+Чтение и touch не ждут дольше BUSY_TIMEOUT и не падают, если файл занят
+или недоступен: такая ошибка SQLite считается промахом кэша.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from itertools import islice
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Сколько секунд ждать, пока другой процесс держит запись.
+BUSY_TIMEOUT = 5
+# Предел числа параметров в одном запросе SQLite.
+MAX_VARIABLES = 500
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+    'expires REAL, accessed REAL NOT NULL) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+)
+LIVE = '(expires IS NULL OR expires > ?)'
+
+
+def _chunks(items, size=MAX_VARIABLES):
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class SQLiteCache(BaseCache):
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        options = params.get('OPTIONS', {})
+        self._cull_every = int(options.get('CULL_EVERY', 50))
+        self._lru_resolution = float(options.get('LRU_RESOLUTION', 1))
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self):
+        """Соединение потока; после fork открывается заново."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._path, timeout=BUSY_TIMEOUT, isolation_level=None,
+                check_same_thread=False
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _transaction(self):
+        """BEGIN IMMEDIATE: запись сразу берёт блокировку, без гонок."""
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        return connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    # Чтение
+
+    def _read(self, keys):
+        """{ключ: значение} живых записей; обновляет время чтения."""
+        now = time.time()
+        found, stale = {}, []
+        try:
+            connection = self._connection()
+            for chunk in _chunks(keys):
+                marks = ', '.join('?' * len(chunk))
+                rows = connection.execute(
+                    f'SELECT key, value, accessed FROM cache '
+                    f'WHERE key IN ({marks}) AND {LIVE}',
+                    (*chunk, now)
+                )
+                for key, value, accessed in rows:
+                    found[key] = pickle.loads(value)
+                    if accessed < now - self._lru_resolution:
+                        stale.append((now, key))
+        except sqlite3.DatabaseError:
+            return {}
+        if stale:
+            try:
+                connection.executemany(
+                    'UPDATE cache SET accessed = ? WHERE key = ?', stale
+                )
+            except sqlite3.DatabaseError:
+                # Запись занята другим процессом: время чтения обновит
+                # следующее чтение, а значение уже прочитано.
+                pass
+        return found
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._read([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        made = {self._key(key, version): key for key in keys}
+        return {made[key]: value for key, value in self._read(made).items()}
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        try:
+            row = self._connection().execute(
+                f'SELECT 1 FROM cache WHERE key = ? AND {LIVE}',
+                (key, time.time())
+            ).fetchone()
+        except sqlite3.DatabaseError:
+            return False
+        return row is not None
+
+    # Запись
+
+    def _write_many(self, items, timeout):
+        expires = self._expires(timeout)
+        now = time.time()
+        rows = [
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires, now)
+            for key, value in items
+        ]
+        connection = self._transaction()
+        try:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)',
+                rows
+            )
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        self._maybe_cull(len(rows))
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write_many([(self._key(key, version), value)], timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write_many(
+            [(self._key(key, version), value) for key, value in data.items()],
+            timeout
+        )
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        connection = self._transaction()
+        try:
+            connection.execute(
+                f'DELETE FROM cache WHERE key = ? AND NOT {LIVE}', (key, now)
+            )
+            added = connection.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)',
+                (
+                    key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                    self._expires(timeout), now
+                )
+            ).rowcount == 1
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        if added:
+            self._maybe_cull(1)
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        made = self._key(key, version)
+        connection = self._transaction()
+        try:
+            row = connection.execute(
+                f'SELECT value FROM cache WHERE key = ? AND {LIVE}',
+                (made, time.time())
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), made)
+            )
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        try:
+            return self._connection().execute(
+                f'UPDATE cache SET expires = ? WHERE key = ? AND {LIVE}',
+                (self._expires(timeout), key, time.time())
+            ).rowcount == 1
+        except sqlite3.DatabaseError:
+            return False
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        return self._connection().execute(
+            'DELETE FROM cache WHERE key = ?', (key,)
+        ).rowcount == 1
+
+    def delete_many(self, keys, version=None):
+        self._connection().executemany(
+            'DELETE FROM cache WHERE key = ?',
+            [(self._key(key, version),) for key in keys]
+        )
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    # Вытеснение
+
+    def _maybe_cull(self, written):
+        self._writes += written
+        if self._writes < self._cull_every:
+            return
+        self._writes = 0
+        self._cull()
+
+    def _cull(self):
+        """Удаляет просроченные записи, затем давно не читанные."""
+        connection = self._connection()
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        connection.execute(
+            f'DELETE FROM cache WHERE NOT {LIVE}', (time.time(),)
+        )
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        if not self._cull_frequency:
+            self.clear()
+            return
+        excess = max(
+            count - self._max_entries, count // self._cull_frequency
+        )
+        connection.execute(
+            'DELETE FROM cache WHERE key IN '
+            '(SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+            (excess,)
+        )
+
+    def close(self, **kwargs):
+        # Соединение потока живёт между запросами, как и у LocMemCache.
+        pass
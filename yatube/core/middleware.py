@@ -0,0 +1,233 @@
+"""Замеры производительности запросов.
+
+PerformanceMiddleware для выборки запросов (PERFORMANCE_SAMPLE_RATE)
+считает число и время SQL-запросов, время отрисовки шаблонов, время
+view и попадания/промахи кэша. Итог уходит в заголовок Server-Timing
+и в лог core.performance одной JSON-строкой.
+
+PerformanceMiddleware стоит в MIDDLEWARE первым, чтобы общее время
+включало все middleware, а ViewTimingMiddleware - последним: оно
+засекает только вызов view. Шаблоны и кэш обёрнуты лишь на время
+замеряемых запросов, как это делает setup_test_environment в тестах.
+"""
+import json
+import logging
+import random
+import threading
+from contextlib import ExitStack, contextmanager
+from time import perf_counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.template.base import Template
+
+logger = logging.getLogger('core.performance')
+
+SAMPLE_RATE = getattr(settings, 'PERFORMANCE_SAMPLE_RATE', 1.0)
+# Запросы быстрее этого порога не логируются (но заголовок получают).
+LOG_MIN_MS = getattr(settings, 'PERFORMANCE_LOG_MIN_MS', 100)
+# Запросы медленнее этого порога логируются как WARNING.
+SLOW_MS = getattr(settings, 'PERFORMANCE_SLOW_MS', 500)
+SERVER_TIMING = getattr(settings, 'PERFORMANCE_SERVER_TIMING', True)
+
+_local = threading.local()
+_MISSING = object()
+# Сколько замеряемых запросов сейчас идёт: Template.render общий для всех
+# потоков, его обёртку снимает последний из них.
+_templates_lock = threading.Lock()
+_templates_users = 0
+_original_render = None
+
+
+class RequestStats:
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.view_started = None
+        self.view_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.total_time = 0.0
+
+    def execute(self, execute, sql, params, many, context):
+        """Обёртка для connection.execute_wrapper."""
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += perf_counter() - started
+            self.sql_count += 1
+
+    def server_timing(self):
+        return ', '.join((
+            f'db;dur={self.sql_time * 1000:.1f};'
+            f'desc="{self.sql_count} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'view;dur={self.view_time * 1000:.1f}',
+            f'cache;desc="hit={self.cache_hits} miss={self.cache_misses}"',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ))
+
+    def as_dict(self):
+        return {
+            'sql_count': self.sql_count,
+            'sql_ms': round(self.sql_time * 1000, 2),
+            'template_ms': round(self.template_time * 1000, 2),
+            'view_ms': round(self.view_time * 1000, 2),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'total_ms': round(self.total_time * 1000, 2),
+        }
+
+
+def current_stats():
+    """Замеры текущего запроса или None, если он не попал в выборку."""
+    return getattr(_local, 'stats', None)
+
+
+def _timed_render(render):
+    """Обёртка Template.render; вложенные include не считаются дважды."""
+    def timed_render(self, context):
+        stats = current_stats()
+        if stats is None:
+            return render(self, context)
+        stats.template_depth += 1
+        started = perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            stats.template_depth -= 1
+            if not stats.template_depth:
+                stats.template_time += perf_counter() - started
+
+    return timed_render
+
+
+@contextmanager
+def instrument_templates():
+    """Оборачивает Template.render, пока идёт хотя бы один замер.
+
+    Другие потоки в это время видят обёртку, но без current_stats()
+    она сразу зовёт исходный render.
+    """
+    global _templates_users, _original_render
+    with _templates_lock:
+        if not _templates_users:
+            _original_render = Template.render
+            Template.render = _timed_render(_original_render)
+        _templates_users += 1
+    try:
+        yield
+    finally:
+        with _templates_lock:
+            _templates_users -= 1
+            if not _templates_users:
+                Template.render = _original_render
+                _original_render = None
+
+
+@contextmanager
+def instrument_cache(cache, stats):
+    """Считает попадания и промахи get/get_many у экземпляра кэша.
+
+    Экземпляры кэша свои у каждого потока, поэтому обёртка на атрибутах
+    экземпляра видна только текущему запросу и снимается после него.
+    """
+    get, get_many = cache.get, cache.get_many
+
+    def counted_get(key, default=None, version=None):
+        value = get(key, _MISSING, version=version)
+        if value is _MISSING:
+            stats.cache_misses += 1
+            return default
+        stats.cache_hits += 1
+        return value
+
+    def counted_get_many(keys, version=None):
+        keys = list(keys)
+        values = get_many(keys, version=version)
+        stats.cache_hits += len(values)
+        stats.cache_misses += len(keys) - len(values)
+        return values
+
+    cache.get = counted_get
+    cache.get_many = counted_get_many
+    try:
+        yield
+    finally:
+        del cache.get
+        del cache.get_many
+
+
+class PerformanceMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if SAMPLE_RATE <= 0 or random.random() >= SAMPLE_RATE:
+            return self.get_response(request)
+        stats = _local.stats = RequestStats()
+        started = perf_counter()
+        try:
+            with ExitStack() as stack:
+                stack.enter_context(instrument_templates())
+                for alias in settings.CACHES:
+                    stack.enter_context(
+                        instrument_cache(caches[alias], stats)
+                    )
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(stats.execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            _local.stats = None
+        stats.total_time = perf_counter() - started
+        if SERVER_TIMING:
+            response['Server-Timing'] = stats.server_timing()
+        self.log(request, response, stats)
+        return response
+
+    def log(self, request, response, stats):
+        total_ms = stats.total_time * 1000
+        if total_ms < LOG_MIN_MS:
+            return
+        match = request.resolver_match
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            **stats.as_dict(),
+        }
+        level = logging.WARNING if total_ms >= SLOW_MS else logging.INFO
+        logger.log(level, json.dumps(record, ensure_ascii=False))
+
+
+class ViewTimingMiddleware:
+    """Засекает вызов view для PerformanceMiddleware.
+
+    Стоит в MIDDLEWARE последним: process_view остальных middleware уже
+    отработали, а ответ возвращается сюда сразу из view (и отрисовки
+    TemplateResponse), до обработки ответа внешними middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = current_stats()
+        if stats is None:
+            return self.get_response(request)
+        response = self.get_response(request)
+        if stats.view_started is not None:
+            stats.view_time = perf_counter() - stats.view_started
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = current_stats()
+        if stats is not None:
+            stats.view_started = perf_counter()
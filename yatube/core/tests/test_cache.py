@@ -0,0 +1,159 @@
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from unittest import mock
+
+from core.cache import SQLiteCache
+from django.test import SimpleTestCase
+
+
+def _incr_many(path, times):
+    cache = SQLiteCache(path, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_set_get_delete(self):
+        self.cache.set('key', {'value': [1, 2]})
+        self.assertEqual(self.cache.get('key'), {'value': [1, 2]})
+        self.assertTrue(self.cache.has_key('key'))
+        self.assertTrue(self.cache.delete('key'))
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get('key', 'default'), 'default')
+
+    def test_timeout(self):
+        self.cache.set('key', 'value', timeout=10)
+        with mock.patch('time.time', return_value=time.time() + 11):
+            self.assertIsNone(self.cache.get('key'))
+            self.assertFalse(self.cache.has_key('key'))
+            self.assertTrue(self.cache.add('key', 'new'))
+        self.cache.set('forever', 'value', timeout=None)
+        with mock.patch('time.time', return_value=time.time() + 10 ** 6):
+            self.assertEqual(self.cache.get('forever'), 'value')
+
+    def test_touch(self):
+        self.cache.set('key', 'value', timeout=10)
+        self.assertTrue(self.cache.touch('key', timeout=100))
+        with mock.patch('time.time', return_value=time.time() + 50):
+            self.assertEqual(self.cache.get('key'), 'value')
+        self.assertFalse(self.cache.touch('missing'))
+
+    def test_locked_file_does_not_fail_reads(self):
+        with mock.patch('core.cache.BUSY_TIMEOUT', 0):
+            cache = self.make_cache(LRU_RESOLUTION=0)
+            cache.set('key', 'value')
+        writer = sqlite3.connect(self.path, isolation_level=None)
+        self.addCleanup(writer.close)
+        writer.execute('BEGIN IMMEDIATE')
+        try:
+            with mock.patch('time.time', return_value=time.time() + 1):
+                self.assertEqual(cache.get('key'), 'value')
+            self.assertTrue(cache.has_key('key'))
+            self.assertFalse(cache.touch('key', timeout=100))
+        finally:
+            writer.execute('ROLLBACK')
+        self.assertTrue(cache.touch('key', timeout=100))
+
+    def test_database_errors_are_misses(self):
+        self.cache.set('key', 'value')
+        error = sqlite3.DatabaseError('file is not a database')
+        with mock.patch.object(self.cache, '_connection', side_effect=error):
+            self.assertEqual(self.cache.get('key', 'default'), 'default')
+            self.assertEqual(self.cache.get_many(['key']), {})
+            self.assertFalse(self.cache.has_key('key'))
+            self.assertFalse(self.cache.touch('key'))
+
+    def test_add_keeps_live_value(self):
+        self.assertTrue(self.cache.add('key', 'first'))
+        self.assertFalse(self.cache.add('key', 'second'))
+        self.assertEqual(self.cache.get('key'), 'first')
+
+    def test_incr(self):
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 5), 6)
+        self.assertEqual(self.cache.decr('counter'), 5)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_many(self):
+        self.cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(
+            self.cache.get_many(['a', 'c', 'missing']), {'a': 1, 'c': 3}
+        )
+        self.cache.delete_many(['a', 'b'])
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']), {'c': 3})
+        self.cache.clear()
+        self.assertEqual(self.cache.get_many(['c']), {})
+
+    def test_versions_are_separate(self):
+        self.cache.set('key', 'old', version=1)
+        self.cache.set('key', 'new', version=2)
+        self.assertEqual(self.cache.get('key', version=1), 'old')
+        self.assertEqual(self.cache.get('key', version=2), 'new')
+
+    def test_least_recently_read_entries_are_evicted(self):
+        cache = self.make_cache(
+            MAX_ENTRIES=10, CULL_FREQUENCY=2, CULL_EVERY=1,
+            LRU_RESOLUTION=0
+        )
+        now = time.time()
+        for number in range(10):
+            with mock.patch('time.time', return_value=now + number):
+                cache.set(f'key{number}', number)
+        with mock.patch('time.time', return_value=now + 20):
+            cache.get('key0')
+            cache.set('extra', 'value')
+        remaining = cache.get_many([f'key{number}' for number in range(10)])
+        self.assertLessEqual(len(remaining) + 1, 10)
+        self.assertIn('key0', remaining)
+        self.assertNotIn('key1', remaining)
+        self.assertEqual(cache.get('extra'), 'value')
+
+    def test_expired_entries_are_culled_first(self):
+        cache = self.make_cache(MAX_ENTRIES=5, CULL_EVERY=1)
+        for number in range(5):
+            cache.set(f'old{number}', number, timeout=1)
+        with mock.patch('time.time', return_value=time.time() + 2):
+            cache.set('fresh', 'value')
+        self.assertEqual(cache.get('fresh'), 'value')
+        self.assertEqual(
+            cache._connection().execute(
+                'SELECT COUNT(*) FROM cache'
+            ).fetchone()[0],
+            1
+        )
+
+    def test_shared_between_instances(self):
+        other = self.make_cache()
+        self.cache.set('key', 'value')
+        self.assertEqual(other.get('key'), 'value')
+        other.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_incr_is_atomic_across_processes(self):
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('spawn')
+        workers = [
+            context.Process(target=_incr_many, args=(self.path, 50))
+            for _ in range(3)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+            self.assertEqual(worker.exitcode, 0)
+        self.assertEqual(self.cache.get('counter'), 150)
@@ -0,0 +1,71 @@
+import json
+import re
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.base import Template
+from django.test import Client, TestCase, override_settings
+
+SLOW_RESPONSE_MS = 50
+
+
+def slow_response_middleware(get_response):
+    """Внешний middleware, долго обрабатывающий ответ."""
+    def middleware(request):
+        response = get_response(request)
+        time.sleep(SLOW_RESPONSE_MS / 1000)
+        return response
+    return middleware
+
+
+class PerformanceMiddlewareTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+
+    def test_server_timing_header(self):
+        response = self.guest.get('/')
+        header = response['Server-Timing']
+        for metric in ('db', 'tpl', 'view', 'cache', 'total'):
+            with self.subTest(metric=metric):
+                self.assertRegex(header, rf'(^|, ){metric};')
+        queries = int(re.search(r'desc="(\d+) queries"', header).group(1))
+        self.assertGreater(queries, 0)
+
+    def test_structured_log_line(self):
+        with mock.patch('core.middleware.LOG_MIN_MS', 0):
+            with self.assertLogs('core.performance', 'INFO') as logs:
+                self.guest.get('/')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'Posts:index')
+        self.assertEqual(record['status'], 200)
+        self.assertIn('sql_count', record)
+
+    def test_unsampled_request_is_not_measured(self):
+        with mock.patch('core.middleware.SAMPLE_RATE', 0):
+            response = self.guest.get('/')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_view_time_excludes_outer_middleware(self):
+        middleware = list(settings.MIDDLEWARE)
+        middleware.insert(1, f'{__name__}.slow_response_middleware')
+        with override_settings(MIDDLEWARE=middleware):
+            with mock.patch('core.middleware.LOG_MIN_MS', 0):
+                with self.assertLogs('core.performance', 'INFO') as logs:
+                    Client().get('/')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertGreaterEqual(record['total_ms'], SLOW_RESPONSE_MS)
+        self.assertGreater(record['view_ms'], 0)
+        self.assertLess(
+            record['view_ms'], record['total_ms'] - SLOW_RESPONSE_MS
+        )
+
+    def test_instrumentation_is_removed_after_request(self):
+        render = Template.render
+        self.guest.get('/')
+        self.assertIs(Template.render, render)
+        self.assertNotIn('get', vars(cache))
+        self.assertNotIn('get_many', vars(cache))
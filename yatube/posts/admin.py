@@ -1,10 +1,118 @@
+from datetime import datetime, timedelta
+
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.utils import timezone
 
+from . import counters, search
+from .forms import PostImageMixin
 from .models import Group, Post
+from .utils import CountCachingPaginator
+
+# Последние дни, которые фильтр по дате предлагает выбрать отдельно.
+RECENT_DAYS = (7, 30)
+
+
+class PubDateFilter(admin.FieldListFilter):
+    """Фильтр по дате публикации на индексе post_date_idx.
+
+    Годы берутся из самого раннего и самого позднего поста (два запроса
+    с LIMIT 1 по индексу), выбранный период - диапазон по pub_date.
+    """
+    parameter_name = 'published'
+
+    def __init__(self, field, request, params, model, model_admin,
+                 field_path):
+        super().__init__(
+            field, request, params, model, model_admin, field_path
+        )
+        self.value = self.used_parameters.get(self.parameter_name, '')
+        dates = model._default_manager.order_by(field_path).values_list(
+            field_path, flat=True
+        )
+        self.bounds = dates.first(), dates.last()
+
+    def expected_parameters(self):
+        return [self.parameter_name]
+
+    def lookups(self):
+        yield '', 'Любая дата'
+        for days in RECENT_DAYS:
+            yield f'{days}d', f'Последние {days} дней'
+        first, last = self.bounds
+        if first is not None:
+            for year in range(last.year, first.year - 1, -1):
+                yield str(year), str(year)
+
+    def choices(self, changelist):
+        for value, title in self.lookups():
+            yield {
+                'selected': self.value == value,
+                'query_string': changelist.get_query_string(
+                    {self.parameter_name: value} if value else {},
+                    [self.parameter_name]
+                ),
+                'display': title,
+            }
+
+    def period(self):
+        value = self.value
+        if value.endswith('d') and value[:-1].isdigit():
+            return timezone.now() - timedelta(days=int(value[:-1])), None
+        if value.isdigit() and 1 <= int(value) < 9999:
+            start = timezone.make_aware(datetime(int(value), 1, 1))
+            return start, start.replace(year=start.year + 1)
+        return None, None
+
+    def queryset(self, request, queryset):
+        start, end = self.period()
+        if start is not None:
+            queryset = queryset.filter(**{f'{self.field_path}__gte': start})
+        if end is not None:
+            queryset = queryset.filter(**{f'{self.field_path}__lt': end})
+        return queryset
+
+
+class GroupSelect(AutocompleteSelect):
+    """Выбор группы с подгрузкой вариантов по мере ввода.
+
+    В строке списка отрисовывается только текущая группа, взятая из уже
+    загруженного поста (selected), без запроса на каждую строку.
+    """
+    selected = None
+
+    def optgroups(self, name, value, attr=None):
+        if self.selected is None:
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        for pk, label in self.selected.items():
+            options.append(
+                self.create_option(name, pk, label, True, len(options))
+            )
+        return [(None, options, 0)]
+
+
+class PostAdminForm(PostImageMixin, forms.ModelForm):
+    pass
+
+
+class PostChangeListForm(forms.ModelForm):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        widget = self.fields['group'].widget
+        # В списке поле обёрнуто в RelatedFieldWidgetWrapper.
+        widget = getattr(widget, 'widget', widget)
+        group = self.instance.group
+        widget.selected = {str(group.pk): str(group)} if group else {}
 
 
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
+    form = PostAdminForm
     list_display = (
         'pk',
         'text',
@@ -14,9 +122,56 @@ class PostAdmin(admin.ModelAdmin):
         'image'
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    autocomplete_fields = ('group',)
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
+    def get_list_filter(self, request):
+        # PubDateFilter подставляется только здесь, а не регистрируется
+        # для всех полей дат всех админок.
+        return [
+            ('pub_date', PubDateFilter) if field == 'pub_date' else field
+            for field in self.list_filter
+        ]
+
+    def get_changelist_form(self, request, **kwargs):
+        kwargs.setdefault('form', PostChangeListForm)
+        return super().get_changelist_form(request, **kwargs)
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'group':
+            kwargs['widget'] = GroupSelect(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get('using')
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        """Число строк без COUNT(*) по всей таблице.
+
+        Для всего списка оно берётся из счётчиков авторов, для
+        отфильтрованного или найденного - точное, из кэша.
+        """
+        count = None
+        if not queryset.query.has_filters():
+            count = counters.total_posts()
+        return CountCachingPaginator(
+            queryset, per_page, count=count, orphans=orphans,
+            allow_empty_first_page=allow_empty_first_page
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по полнотекстовому индексу вместо LIKE '%...%'."""
+        if not search_term:
+            return queryset, False
+        return search.get_index().filter(queryset, search_term), False
+
 
-admin.site.register(Group)
+@admin.register(Group)
+class GroupAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'title', 'slug')
+    search_fields = ('title', 'slug')
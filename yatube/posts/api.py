@@ -0,0 +1,148 @@
+"""JSON API только для чтения.
+
+Те же ленты, что и HTML-страницы, но без моделей и шаблонов: строки
+выбираются через .values(), страницы курсорные (?cursor=... / ?before=...),
+в ответе - ссылки на картинку и готовые миниатюры. Ответы лент кэшируются
+с версией области из caching, как фрагменты HTML-лент.
+"""
+import json
+from hashlib import md5
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+
+from . import caching, thumbnails
+from .models import Comment, Group, Post, User
+from .utils import CursorPaginator
+from .views import COMMENTS_COUNT, POSTS_COUNT
+
+# Сколько секунд живёт закэшированный ответ ленты.
+CACHE_TIMEOUT = 300
+
+POST_FIELDS = (
+    'id', 'text', 'pub_date', 'author__username', 'group__slug', 'image'
+)
+COMMENT_FIELDS = ('id', 'text', 'pub_date', 'author__username')
+
+
+def _json(data):
+    return json.dumps(
+        data, cls=DjangoJSONEncoder, ensure_ascii=False,
+        separators=(',', ':')
+    )
+
+
+def _response(body):
+    return HttpResponse(body, content_type='application/json')
+
+
+def _thumbnail_urls(found, pk):
+    urls = {}
+    for geometry, _ in thumbnails.GEOMETRIES:
+        image = found.get((pk, geometry, thumbnails.DEFAULT_FORMAT))
+        if image is not None:
+            urls[geometry] = image.url
+    return urls
+
+
+def _serialize_posts(rows):
+    found = thumbnails.prefetch_images(
+        (row['id'], row['image']) for row in rows
+    )
+    return [
+        {
+            'id': row['id'],
+            'text': row['text'],
+            'pub_date': row['pub_date'],
+            'author': row['author__username'],
+            'group': row['group__slug'],
+            'image': (
+                default_storage.url(row['image']) if row['image'] else None
+            ),
+            'thumbnails': _thumbnail_urls(found, row['id']),
+        }
+        for row in rows
+    ]
+
+
+def _serialize_comments(rows):
+    return [
+        {
+            'id': row['id'],
+            'text': row['text'],
+            'pub_date': row['pub_date'],
+            'author': row['author__username'],
+        }
+        for row in rows
+    ]
+
+
+def _page(request, rows, per_page, serialize, descending=True):
+    paginator = CursorPaginator(rows, per_page, descending=descending)
+    page = paginator.get_cursor_page(
+        after=request.GET.get('cursor'),
+        before=request.GET.get('before'),
+    )
+    return {
+        'results': serialize(page.object_list),
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }
+
+
+def _feed(request, scope, posts):
+    """Страница ленты из кэша или из базы, если версия области сменилась."""
+    key = 'posts:api:{}:{}:{}'.format(
+        scope,
+        caching.listing_version(scope),
+        md5(request.GET.urlencode().encode()).hexdigest()
+    )
+    body = cache.get(key)
+    if body is None:
+        body = _json(_page(
+            request, posts.values(*POST_FIELDS), POSTS_COUNT,
+            _serialize_posts
+        ))
+        cache.set(key, body, CACHE_TIMEOUT)
+    return _response(body)
+
+
+def index(request):
+    return _feed(request, caching.INDEX, Post.objects.all())
+
+
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    return _feed(request, caching.group_scope(group.pk), group.posts.all())
+
+
+def profile(request, username):
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    return _feed(
+        request, caching.profile_scope(author.pk), author.posts.all()
+    )
+
+
+def post_detail(request, post_id):
+    row = (
+        Post.objects.filter(pk=post_id)
+        .values(*POST_FIELDS, 'comments_count').first()
+    )
+    if row is None:
+        raise Http404
+    data = _serialize_posts([row])[0]
+    data['comments_count'] = row['comments_count']
+    return _response(_json(data))
+
+
+def post_comments(request, post_id):
+    comments = Comment.objects.filter(post_id=post_id).values(
+        *COMMENT_FIELDS
+    )
+    return _response(_json(_page(
+        request, comments, COMMENTS_COUNT, _serialize_comments,
+        descending=False
+    )))
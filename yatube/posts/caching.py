@@ -0,0 +1,87 @@
+"""Версии кэша страниц-лент.
+
+Фрагменты лент кэшируются в шаблонах с ключом, в который входит версия
+области (главная, группа, профиль). Сброс области - это смена её версии:
+старые фрагменты просто перестают находиться и вытесняются по таймауту.
+Версия - случайный токен с меткой времени смены, поэтому вытеснение
+самой версии из кэша не может вернуть к жизни устаревшие фрагменты,
+а по метке можно отдать Last-Modified.
+"""
+from datetime import datetime, timezone
+from time import time
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'posts:listing:{}'
+
+INDEX = 'index'
+# Рекомендации «На кого подписаться», сбрасываются после пересчёта.
+SUGGESTIONS = 'suggestions'
+# Общая версия всех областей.
+ALL = 'all'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def profile_scope(user_id):
+    return f'profile:{user_id}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def new_version():
+    return f'{int(time())}.{uuid4().hex}'
+
+
+def listing_version(*scopes):
+    """Текущая версия областей; ставится при первом обращении.
+
+    В версию входит и общая версия всех областей, которую сбрасывает
+    invalidate_all.
+    """
+    keys = [VERSION_KEY.format(scope) for scope in (ALL, *scopes)]
+    found = cache.get_many(keys)
+    if len(found) < len(keys):
+        for key in keys:
+            if key not in found:
+                cache.add(key, new_version(), None)
+        found = cache.get_many(keys)
+    return '|'.join(found[key] for key in keys)
+
+
+def changed_at(version):
+    """Время последней смены версии или None для версии без метки."""
+    try:
+        stamp = max(int(part.split('.')[0]) for part in version.split('|'))
+    except ValueError:
+        return None
+    return datetime.fromtimestamp(stamp, timezone.utc)
+
+
+def invalidate(*scopes):
+    """Сбрасывает кэш перечисленных областей."""
+    cache.set_many(
+        {VERSION_KEY.format(scope): new_version() for scope in scopes},
+        None
+    )
+
+
+def invalidate_on_commit(*scopes):
+    """invalidate после фиксации текущей транзакции.
+
+    Если сменить версию до COMMIT, параллельный запрос успеет прочитать
+    ещё старые строки и закэшировать их под новой версией до конца
+    таймаута. При откате транзакции версия не меняется.
+    """
+    transaction.on_commit(lambda: invalidate(*scopes))
+
+
+def invalidate_all():
+    """Сбрасывает кэш всех областей сразу, например после импорта."""
+    invalidate(ALL)
@@ -0,0 +1,94 @@
+"""Условные GET для страниц лент и поста.
+
+ETag страницы - хэш версии её области из caching (версия меняется при
+любой правке постов, комментариев и подписок, которые видны на странице)
+и того, кто смотрит: у вошедшего пользователя своя шапка, кнопка подписки
+и CSRF-токен в формах, а на профиле - рекомендации, поэтому туда входят
+и версии его профиля и рекомендаций. Last-Modified берётся из метки
+времени версии и отдаётся только гостям, чтобы клиент, присылающий один
+If-Modified-Since, не получил 304 на страницу другого пользователя.
+
+Всё это - не больше одного запроса за группой или профилем (view потом
+берёт их же через page_group/page_profile) и чтение кэша, поэтому на 304
+тяжёлые запросы и отрисовка шаблонов не выполняются.
+"""
+from hashlib import md5
+
+from django.conf import settings
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import condition
+
+from . import caching
+from .models import Group, User
+
+
+def index_scope(request):
+    return caching.INDEX
+
+
+def page_group(request, slug):
+    """Группа страницы; ищется один раз за запрос."""
+    if not hasattr(request, '_page_group'):
+        request._page_group = get_object_or_404(Group, slug=slug)
+    return request._page_group
+
+
+def page_profile(request, username):
+    """Автор страницы профиля со счётчиками; ищется один раз за запрос."""
+    if not hasattr(request, '_page_profile'):
+        request._page_profile = get_object_or_404(
+            User.objects.select_related('stats'), username=username
+        )
+    return request._page_profile
+
+
+def group_scope(request, slug):
+    return caching.group_scope(page_group(request, slug).pk)
+
+
+def profile_scope(request, username):
+    scopes = [caching.profile_scope(page_profile(request, username).pk)]
+    user = request.user
+    if user.is_authenticated:
+        # Рекомендации вошедшему меняются с его подписками и пересчётом.
+        scopes += [caching.profile_scope(user.pk), caching.SUGGESTIONS]
+    return scopes
+
+
+def post_scope(request, post_id):
+    return caching.post_scope(post_id)
+
+
+def _viewer(request):
+    user = request.user
+    if not user.is_authenticated:
+        return ''
+    csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    return f'{user.pk}:{csrf}'
+
+
+def conditional_page(scope_of):
+    """Декоратор view: ответ 304, если область страницы не менялась.
+
+    scope_of(request, **kwargs) возвращает область caching для страницы
+    или список областей.
+    """
+    def version(request, **kwargs):
+        # condition вызывает обе функции; версию читаем один раз.
+        if not hasattr(request, '_page_version'):
+            scopes = scope_of(request, **kwargs)
+            if isinstance(scopes, str):
+                scopes = [scopes]
+            request._page_version = caching.listing_version(*scopes)
+        return request._page_version
+
+    def etag(request, **kwargs):
+        current = version(request, **kwargs)
+        return md5(f'{current}|{_viewer(request)}'.encode()).hexdigest()
+
+    def last_modified(request, **kwargs):
+        if request.user.is_authenticated:
+            return None
+        return caching.changed_at(version(request, **kwargs))
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
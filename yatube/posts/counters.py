@@ -0,0 +1,61 @@
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import AuthorStats, Comment, Follow, Post, User
+
+
+def _add(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def change_user(user_id, field, delta):
+    """Атомарно меняет счётчик пользователя на delta."""
+    if _add(AuthorStats.objects.filter(user_id=user_id), field, delta):
+        return
+    if delta > 0:
+        AuthorStats.objects.get_or_create(user_id=user_id)
+        _add(AuthorStats.objects.filter(user_id=user_id), field, delta)
+
+
+def change_comments(post_id, delta):
+    """Атомарно меняет счётчик комментариев поста на delta."""
+    _add(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def total_posts():
+    """Число всех постов по счётчикам авторов, без COUNT(*) по постам."""
+    return AuthorStats.objects.aggregate(
+        total=Coalesce(Sum('posts_count'), 0)
+    )['total']
+
+
+def _count_by(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0
+    )
+
+
+def rebuild():
+    """Пересчитывает все счётчики пакетно, несколькими UPDATE."""
+    AuthorStats.objects.bulk_create(
+        (AuthorStats(user_id=pk) for pk in
+         User.objects.filter(stats__isnull=True).values_list('pk', flat=True)),
+        ignore_conflicts=True,
+    )
+    AuthorStats.objects.update(
+        posts_count=_count_by(Post.objects.all(), 'author'),
+        followers_count=_count_by(Follow.objects.all(), 'author'),
+        following_count=_count_by(Follow.objects.all(), 'user'),
+    )
+    Post.objects.update(
+        comments_count=_count_by(Comment.objects.all(), 'post')
+    )
@@ -0,0 +1,153 @@
+"""Потоковая выгрузка постов, комментариев и подписок в CSV и JSONL.
+
+Строки читаются по ключу: каждая порция - запрос с pk > последнего
+выгруженного и LIMIT chunk_size, прочитанный через iterator(chunk_size),
+поэтому память не растёт с размером таблицы, а длинных OFFSET нет.
+Фильтры по автору, группе и датам уходят в WHERE того же запроса.
+"""
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Comment, Follow, Post
+
+CHUNK_SIZE = 2000
+
+# Выгрузка: модель, {колонка: поле в values()}, фильтры.
+EXPORTS = {
+    'posts': (
+        Post,
+        {
+            'id': 'id',
+            'author': 'author__username',
+            'group': 'group__slug',
+            'text': 'text',
+            'pub_date': 'pub_date',
+            'image': 'image',
+            'comments_count': 'comments_count',
+        },
+        {
+            'author': 'author__username',
+            'group': 'group__slug',
+            'date': 'pub_date',
+        },
+    ),
+    'comments': (
+        Comment,
+        {
+            'id': 'id',
+            'post': 'post_id',
+            'author': 'author__username',
+            'text': 'text',
+            'pub_date': 'pub_date',
+        },
+        {
+            'author': 'author__username',
+            'group': 'post__group__slug',
+            'date': 'pub_date',
+        },
+    ),
+    'follows': (
+        Follow,
+        {
+            'id': 'id',
+            'user': 'user__username',
+            'author': 'author__username',
+        },
+        {
+            'author': 'author__username',
+        },
+    ),
+}
+FORMATS = ('csv', 'jsonl')
+
+
+class ExportError(ValueError):
+    """Неизвестная выгрузка или неверный фильтр."""
+
+
+def _moment(value, name):
+    """Дата или дата-время фильтра; у даты - начало суток."""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ExportError(f'Неверная дата в {name}: {value}')
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def queryset(kind, author=None, group=None, since=None, until=None):
+    """Отфильтрованная выборка.
+
+    since - включительно, until - по конец указанных суток (или до
+    указанного момента, если передано время).
+    """
+    if kind not in EXPORTS:
+        raise ExportError(f'Нет выгрузки {kind}')
+    model, columns, filters = EXPORTS[kind]
+    lookups = {}
+    for name, value in (('author', author), ('group', group)):
+        if not value:
+            continue
+        if name not in filters:
+            raise ExportError(f'Выгрузку {kind} нельзя фильтровать по {name}')
+        lookups[filters[name]] = value
+    if since or until:
+        if 'date' not in filters:
+            raise ExportError(f'Выгрузку {kind} нельзя фильтровать по дате')
+        if since:
+            lookups[f'{filters["date"]}__gte'] = _moment(since, 'since')
+        if until:
+            end = _moment(until, 'until')
+            if parse_datetime(until) is None:
+                end += timedelta(days=1)
+            lookups[f'{filters["date"]}__lt'] = end
+    return model.objects.filter(**lookups).values(*columns.values())
+
+
+def rows(kind, chunk_size=CHUNK_SIZE, **filters):
+    """Строки выгрузки словарями {колонка: значение} по возрастанию id.
+
+    Фильтры проверяются сразу, а запросы выполняются по мере чтения.
+    """
+    base = queryset(kind, **filters).order_by('pk')
+    return _by_key(base, EXPORTS[kind][1], chunk_size)
+
+
+def _by_key(base, columns, chunk_size):
+    last = 0
+    while True:
+        count = 0
+        chunk = base.filter(pk__gt=last)[:chunk_size]
+        for row in chunk.iterator(chunk_size=chunk_size):
+            count += 1
+            last = row['id']
+            yield {column: row[field] for column, field in columns.items()}
+        if count < chunk_size:
+            return
+
+
+class _Echo:
+    """Файл для csv.writer, который просто возвращает записанное."""
+
+    def write(self, value):
+        return value
+
+
+def lines(kind, fmt, rows):
+    """Строки файла выгрузки по одной."""
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(list(EXPORTS[kind][1]))
+        for row in rows:
+            yield writer.writerow(row.values())
+        return
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
@@ -1,20 +1,55 @@
 from django import forms
 from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import UploadedFile
 
+from . import images
 from .models import Comment, Post
 
 User = get_user_model()
 
 
-class PostForm(forms.ModelForm):
+def validate_text(value):
+    """Общее правило для текста поста и комментария."""
+    if value == '':
+        raise forms.ValidationError('Поле text не должно быть пустым!')
+
+
+class PostImageMixin:
+    """Проверка размера и нормализация картинки поста.
+
+    Общая для PostForm и формы поста в админке.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Слишком большой файл записан на диск не целиком: ImageField
+        # не должен его разбирать, ошибку покажет clean_image.
+        self.oversized = None
+        upload = self.files.get('image')
+        if upload is not None and images.too_large(upload):
+            self.oversized = upload
+            self.files = self.files.copy()
+            del self.files['image']
+
+    def clean_image(self):
+        if self.oversized is not None:
+            raise forms.ValidationError(
+                f'Файл больше {images.MAX_UPLOAD_SIZE // 2 ** 20} МБ'
+            )
+        value = self.cleaned_data.get('image')
+        if isinstance(value, UploadedFile):
+            return images.normalize(value)
+        return value
+
+
+class PostForm(PostImageMixin, forms.ModelForm):
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
 
     def clean_text(self):
         value = self.cleaned_data['text']
-        if value == '':
-            raise forms.ValidationError('Поле text не должно быть пустым!')
+        validate_text(value)
         return value
 
 
@@ -25,6 +60,5 @@ class CommentForm(forms.ModelForm):
 
     def clean_text(self):
         value = self.cleaned_data['text']
-        if value == '':
-            raise forms.ValidationError('Поле text не должно быть пустым!')
+        validate_text(value)
         return value
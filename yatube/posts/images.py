@@ -0,0 +1,141 @@
+"""Нормализация картинок постов при загрузке.
+
+В post_create и post_edit загрузка пишется во временный файл
+(LimitedUploadHandler, декоратор limited_uploads), а не в память, и сверх
+POST_IMAGE_MAX_UPLOAD_SIZE на диск не дописывается. Размер проверяет
+форма (PostForm и форма поста в админке), затем normalize:
+
+- по заголовку, ещё до декодирования, отклоняет картинки больше
+  POST_IMAGE_MAX_PIXELS - защита от decompression bomb;
+- декодирует JPEG сразу в уменьшенном масштабе (draft), поэтому полный
+  кадр 50-мегапиксельной фотографии в памяти не появляется;
+- поворачивает по EXIF Orientation и уменьшает до POST_IMAGE_MAX_SIDE
+  по длинной стороне;
+- пересохраняет в JPEG с качеством POST_IMAGE_QUALITY (с прозрачностью -
+  в PNG) без EXIF и прочих метаданных, кроме цветового профиля.
+
+На каждую загрузку в лог posts.images пишется строка JSON с размерами
+и объёмом декодированного кадра (decoded_bytes) - главной статьёй
+расхода памяти при обработке.
+"""
+import json
+import logging
+import os
+import time
+from functools import wraps
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+MAX_UPLOAD_SIZE = getattr(
+    settings, 'POST_IMAGE_MAX_UPLOAD_SIZE', 20 * 1024 * 1024
+)
+MAX_PIXELS = getattr(settings, 'POST_IMAGE_MAX_PIXELS', 50_000_000)
+MAX_SIDE = getattr(settings, 'POST_IMAGE_MAX_SIDE', 2048)
+QUALITY = getattr(settings, 'POST_IMAGE_QUALITY', 85)
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку во временный файл, но не больше MAX_UPLOAD_SIZE байт.
+
+    size у файла остаётся полным (его считает парсер запроса), и форма
+    отклоняет слишком большой файл, не разбирая обрезанное содержимое.
+    Поэтому обработчик ставится только на view с такой формой.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received <= MAX_UPLOAD_SIZE:
+            self.file.write(raw_data)
+
+
+def limited_uploads(view):
+    """Ставит LimitedUploadHandler на запросы view.
+
+    Обработчики загрузки можно заменить только до чтения request.POST,
+    а его читает CsrfViewMiddleware, поэтому проверка CSRF переносится
+    внутрь view.
+    """
+    protected = csrf_protect(view)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.upload_handlers = [LimitedUploadHandler(request)]
+        return protected(request, *args, **kwargs)
+    return csrf_exempt(wrapper)
+
+
+def too_large(upload):
+    return upload.size > MAX_UPLOAD_SIZE
+
+
+def _transparent(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def normalize(upload):
+    """Новый файл картинки для Post.image из загруженного."""
+    started = time.perf_counter()
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except (Image.DecompressionBombError, OSError):
+        raise ValidationError('Не удалось прочитать картинку')
+    with image:
+        source_size = image.size
+        width, height = source_size
+        if width * height > MAX_PIXELS:
+            raise ValidationError(
+                f'Картинка больше {MAX_PIXELS // 10 ** 6} мегапикселей'
+            )
+        scale = min(1, MAX_SIDE / max(width, height))
+        image.draft('RGB', (
+            max(1, int(width * scale)), max(1, int(height * scale))
+        ))
+        decoded_bytes = (
+            image.size[0] * image.size[1] * len(image.getbands())
+        )
+        icc_profile = image.info.get('icc_profile')
+        try:
+            image = ImageOps.exif_transpose(image)
+        except OSError:
+            raise ValidationError('Не удалось прочитать картинку')
+    image.thumbnail((MAX_SIDE, MAX_SIDE), Image.LANCZOS)
+    if _transparent(image):
+        image = image.convert('RGBA')
+        fmt, extension, options = 'PNG', 'png', {'optimize': True}
+    else:
+        image = image.convert('RGB')
+        fmt, extension, options = 'JPEG', 'jpg', {
+            'quality': QUALITY, 'optimize': True, 'progressive': True,
+        }
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    output = BytesIO()
+    image.save(output, fmt, **options)
+
+    name = os.path.splitext(os.path.basename(upload.name))[0] or 'image'
+    normalized = ContentFile(output.getvalue(), name=f'{name}.{extension}')
+    logger.info(json.dumps({
+        'name': normalized.name,
+        'source_bytes': upload.size,
+        'source_size': source_size,
+        'decoded_bytes': decoded_bytes,
+        'size': image.size,
+        'bytes': normalized.size,
+        'ms': round((time.perf_counter() - started) * 1000, 2),
+    }))
+    return normalized
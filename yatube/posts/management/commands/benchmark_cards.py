@@ -0,0 +1,138 @@
+import json
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.template import Context, Engine
+from django.template.backends.django import get_installed_libraries
+from django.utils import timezone
+from posts import thumbnails
+from posts.models import Group, Post
+
+from .benchmark_views import percentile
+
+User = get_user_model()
+
+# Разметка карточки до post_card: reverse и фильтры на каждый пост.
+INLINE = '''{% load post_thumbnails %}{% for post in posts %}
+<article>
+  <ul>
+    <li>
+      Автор: {{ post.author.get_full_name }}
+      <a href="{% url 'posts:profile' post.author %}">
+        все посты пользователя
+      </a>
+    </li>
+    <li>
+      Дата публикации: {{ post.pub_date|date:"d E Y" }}
+    </li>
+  </ul>
+  {% post_picture thumbnails post "960x339" %}
+  <p>{{ post.text| linebreaksbr }}</p>
+  <a href="{% url 'posts:post_detail' post.pk %}">подробная информация</a>
+</article>
+{% endfor %}'''
+COMPONENT = '''{% load post_cards %}{% for post in posts %}
+{% post_card post thumbnails %}
+{% endfor %}'''
+
+LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет отрисовку карточек постов без базы: прежняя разметка '
+        'с {% url %} и фильтрами, post_card без кэша шаблонов и post_card '
+        'с кэширующим загрузчиком. Печатает JSON с p50/p95 микросекунд '
+        'на карточку.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cards', type=int, default=20,
+            help='Карточек на странице.'
+        )
+        parser.add_argument(
+            '--image-share', type=float, default=0.3,
+            help='Доля постов с картинкой.'
+        )
+        parser.add_argument('--pages', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=10)
+
+    def posts(self, count, image_share):
+        group = Group(pk=1, title='Группа', slug='group')
+        now = timezone.now()
+        posts = []
+        for number in range(1, count + 1):
+            # Картинки равномерно распределены по странице.
+            with_image = number * image_share % 1 < image_share
+            posts.append(Post(
+                pk=number,
+                text='Первая строка\nвторая строка & <разметка>\n' * 5,
+                pub_date=now - timedelta(hours=number),
+                author=User(
+                    pk=number % 7 + 1, username=f'author_{number % 7}',
+                    first_name='Имя', last_name='Фамилия',
+                ),
+                group=group,
+                image='posts/card.jpg' if with_image else '',
+            ))
+        return posts
+
+    def thumbnails(self, posts):
+        """Карта как у thumbnails.prefetch, чтобы не трогать хранилище."""
+        return {
+            (post.pk, variant.geometry, variant.format): SimpleNamespace(
+                url=f'/media/cache/{post.pk}/{variant.geometry}.jpg'
+            )
+            for post in posts if post.image
+            for variant in thumbnails.all_variants()
+        }
+
+    def measure(self, engine, source, posts, options):
+        # Страница компилируется один раз; различается только то, что
+        # происходит внутри цикла по карточкам.
+        template = engine.from_string(source)
+        context = {'posts': posts, 'thumbnails': self.thumbnails(posts)}
+        timings = []
+        for number in range(options['warmup'] + options['pages']):
+            started = time.perf_counter()
+            template.render(Context(context))
+            elapsed = time.perf_counter() - started
+            if number >= options['warmup']:
+                timings.append(elapsed * 10 ** 6 / len(posts))
+        return {
+            'p50_us': round(percentile(timings, 0.50), 2),
+            'p95_us': round(percentile(timings, 0.95), 2),
+        }
+
+    def handle(self, *args, **options):
+        options['pages'] = max(1, options['pages'])
+        posts = self.posts(max(1, options['cards']), options['image_share'])
+        engine_options = {
+            'dirs': settings.TEMPLATES[0]['DIRS'],
+            'libraries': get_installed_libraries(),
+        }
+        plain = Engine(loaders=LOADERS, **engine_options)
+        cached = Engine(loaders=[
+            ('django.template.loaders.cached.Loader', LOADERS)
+        ], **engine_options)
+        report = {
+            'cards': len(posts),
+            'with_image': sum(1 for post in posts if post.image),
+            'pages': options['pages'],
+            'per_card': {
+                'inline': self.measure(plain, INLINE, posts, options),
+                'component': self.measure(plain, COMPONENT, posts, options),
+                'component_cached': self.measure(
+                    cached, COMPONENT, posts, options
+                ),
+            },
+        }
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,261 @@
+import json
+import math
+import random
+import time
+from io import BytesIO
+
+from about import urls as about_urls
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from faker import Faker
+from PIL import Image
+from posts import caching, counters, follow_graph, timeline
+from posts import urls as posts_urls
+from posts.management.sandbox import sandbox
+from posts.models import Comment, Follow, Group, Post
+from users import urls as users_urls
+
+User = get_user_model()
+
+PREFIX = 'bench_'
+PASSWORD = 'bench-password'
+URLCONFS = (posts_urls, users_urls, about_urls)
+# После этих страниц клиента нужно залогинить заново.
+LOGS_OUT = {'users:logout'}
+
+
+def percentile(values, share):
+    """Перцентиль методом ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(share * len(ordered)))
+    return ordered[rank - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Засевает реалистичный набор данных и прогоняет через тестовый '
+        'клиент каждую страницу posts, users и about. Печатает JSON с '
+        'p50/p95/p99 времени ответа, числом SQL-запросов и размером ответа.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--images', type=int, default=20,
+            help='Сколько разных картинок раздать постам.'
+        )
+        parser.add_argument(
+            '--image-share', type=float, default=0.3,
+            help='Доля постов с картинкой.'
+        )
+        parser.add_argument(
+            '--zipf', type=float, default=1.2,
+            help='Показатель степенного закона популярности авторов.'
+        )
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок пользователя.'
+        )
+        parser.add_argument('--requests', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Файл для JSON-отчёта.')
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Не откатывать засеянные данные.'
+        )
+
+    def seed_images(self, options, fake):
+        names = []
+        for i in range(options['images']):
+            buffer = BytesIO()
+            size = (random.randint(800, 2400), random.randint(600, 1800))
+            Image.new('RGB', size, fake.color()).save(buffer, 'JPEG')
+            names.append(default_storage.save(
+                f'posts/{PREFIX}{i}.jpg', ContentFile(buffer.getvalue())
+            ))
+        return names
+
+    def seed_follows(self, users, options):
+        """Граф подписок со степенным распределением популярности."""
+        weights = [
+            1 / (rank ** options['zipf']) for rank in range(1, len(users) + 1)
+        ]
+        follows = []
+        for user in users:
+            wanted = min(
+                len(users) - 1,
+                int(random.paretovariate(2) * options['follows'] / 2)
+            )
+            authors = set()
+            for author in random.choices(users, weights, k=wanted * 2):
+                if author != user:
+                    authors.add(author.pk)
+                if len(authors) >= wanted:
+                    break
+            follows.extend(
+                Follow(user_id=user.pk, author_id=author_id)
+                for author_id in authors
+            )
+        Follow.objects.bulk_create(follows)
+
+    def seed(self, options):
+        fake = Faker('ru_RU')
+        fake.seed_instance(options['seed'])
+        random.seed(options['seed'])
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            User(
+                username=f'{PREFIX}{i}',
+                first_name=fake.first_name(),
+                last_name=fake.last_name(),
+                password=password,
+            )
+            for i in range(options['users'])
+        )
+        users = list(
+            User.objects.filter(username__startswith=PREFIX).order_by('pk')
+        )
+        Group.objects.bulk_create(
+            Group(
+                title=fake.sentence(nb_words=3),
+                slug=f'{PREFIX}{i}',
+                description=fake.paragraph(),
+            )
+            for i in range(options['groups'])
+        )
+        groups = list(Group.objects.filter(slug__startswith=PREFIX))
+        images = self.seed_images(options, fake)
+        # Пишущие авторы тоже распределены по степенному закону.
+        weights = [
+            1 / (rank ** options['zipf']) for rank in range(1, len(users) + 1)
+        ]
+        Post.objects.bulk_create(
+            Post(
+                text=fake.text(max_nb_chars=600),
+                author=random.choices(users, weights)[0],
+                group=random.choice(groups + [None]),
+                image=(
+                    random.choice(images)
+                    if images and random.random() < options['image_share']
+                    else ''
+                ),
+            )
+            for _ in range(options['posts'])
+        )
+        post_ids = list(
+            Post.objects.filter(author__username__startswith=PREFIX)
+            .values_list('pk', flat=True)
+        )
+        Comment.objects.bulk_create(
+            Comment(
+                post_id=random.choice(post_ids),
+                author=random.choice(users),
+                text=fake.sentence(),
+            )
+            for _ in range(options['comments'])
+        )
+        self.seed_follows(users, options)
+        # Пересобираются только ленты засеянных читателей, а не вся
+        # таблица TimelineEntry.
+        timeline.rebuild(User.objects.filter(username__startswith=PREFIX))
+        counters.rebuild()
+        follow_graph.invalidate()
+        reader = users[0]
+        post = reader.posts.first() or Post.objects.create(
+            text=fake.text(), author=reader
+        )
+        return reader, users[1], groups[0], post
+
+    def routes(self, author, group, post):
+        values = {
+            'slug': group.slug,
+            'username': author.username,
+            'post_id': post.pk,
+            'kind': 'posts',
+        }
+        for urlconf in URLCONFS:
+            for pattern in urlconf.urlpatterns:
+                name = f'{urlconf.app_name}:{pattern.name}'
+                kwargs = {
+                    key: values[key] for key in pattern.pattern.converters
+                }
+                yield name, reverse(name, kwargs=kwargs)
+
+    def measure(self, client, reader, name, address, options):
+        timings, queries, sizes, statuses = [], [], [], set()
+        for number in range(options['warmup'] + options['requests']):
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = client.get(address)
+                elapsed = time.perf_counter() - started
+            if name in LOGS_OUT:
+                client.force_login(reader)
+            if number < options['warmup']:
+                continue
+            timings.append(elapsed * 1000)
+            queries.append(len(context.captured_queries))
+            sizes.append(len(response.content))
+            statuses.add(response.status_code)
+        return {
+            'url': address,
+            'status': sorted(statuses),
+            'p50_ms': round(percentile(timings, 0.50), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'queries_avg': round(sum(queries) / len(queries), 2),
+            'queries_max': max(queries),
+            'bytes_avg': round(sum(sizes) / len(sizes)),
+        }
+
+    def run(self, options):
+        reader, author, group, post = self.seed(options)
+        client = Client()
+        client.force_login(reader)
+        views = {
+            name: self.measure(client, reader, name, address, options)
+            for name, address in self.routes(author, group, post)
+        }
+        return {
+            'dataset': {
+                key: options[key] for key in (
+                    'users', 'groups', 'posts', 'comments', 'images',
+                    'image_share', 'zipf', 'follows', 'seed',
+                )
+            },
+            'follows_total': Follow.objects.filter(
+                user__username__startswith=PREFIX
+            ).count(),
+            'requests': options['requests'],
+            'views': views,
+        }
+
+    def handle(self, *args, **options):
+        options['requests'] = max(1, options['requests'])
+        if options['keep']:
+            with transaction.atomic():
+                report = self.run(options)
+            # bulk_create не меняет версии кэша: без сброса страницы
+            # остались бы закэшированными без засеянных данных.
+            caching.invalidate_all()
+        else:
+            # Свои кэш и MEDIA_ROOT: засеянное не попадёт в общий кэш
+            # и пропадёт вместе с откатом.
+            with sandbox():
+                report = self.run(options)
+        data = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(data)
+        else:
+            self.stdout.write(data)
@@ -0,0 +1,137 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.management.sandbox import sandbox
+from posts.models import Comment, Follow, Group, Post
+from posts.utils import encode_cursor
+
+User = get_user_model()
+
+PREFIX = 'explain_'
+
+
+def bad_steps(plan):
+    """Шаги плана с полным проходом по таблице или сортировкой в B-tree."""
+    for step in plan:
+        detail = step[-1]
+        full_scan = detail.startswith('SCAN') and 'USING' not in detail
+        if full_scan or 'TEMP B-TREE' in detail:
+            yield detail
+
+
+class Command(BaseCommand):
+    help = (
+        'Засевает данные, снимает EXPLAIN QUERY PLAN для запросов каждой '
+        'ленты и падает, если какой-то запрос читает таблицу целиком '
+        'или сортирует во временном B-tree.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--groups', type=int, default=5)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--comments', type=int, default=100)
+
+    def seed(self, options):
+        User.objects.bulk_create(
+            User(username=f'{PREFIX}{i}') for i in range(options['users'])
+        )
+        users = list(User.objects.filter(username__startswith=PREFIX))
+        Group.objects.bulk_create(
+            Group(
+                title=f'{PREFIX}{i}',
+                slug=f'{PREFIX}{i}',
+                description=PREFIX
+            )
+            for i in range(options['groups'])
+        )
+        groups = list(Group.objects.filter(slug__startswith=PREFIX))
+        Post.objects.bulk_create(
+            (
+                Post(
+                    text=f'{PREFIX}{i}',
+                    author=users[i % len(users)],
+                    group=groups[i % len(groups)] if i % 3 else None
+                )
+                for i in range(options['posts'])
+            )
+        )
+        reader, author = users[0], users[1]
+        post = author.posts.first()
+        Comment.objects.bulk_create(
+            Comment(post=post, author=reader, text=f'{PREFIX}{i}')
+            for i in range(options['comments'])
+        )
+        for followed in users[1:]:
+            Follow.objects.create(user=reader, author=followed)
+        return reader, author, groups[0], post
+
+    def pages(self, author, group, post):
+        cursor = encode_cursor(post.pub_date, post.pk)
+        feeds = {
+            'index': reverse('posts:index'),
+            'group_list': reverse(
+                'posts:group_list', kwargs={'slug': group.slug}
+            ),
+            'profile': reverse(
+                'posts:profile', kwargs={'username': author.username}
+            ),
+            'follow_index': reverse('posts:follow_index'),
+            'api_index': reverse('posts:api_index'),
+            'api_profile': reverse(
+                'posts:api_profile', kwargs={'username': author.username}
+            ),
+        }
+        pages = {}
+        for name, address in feeds.items():
+            pages[name] = address
+            pages[f'{name} ?cursor'] = f'{address}?cursor={cursor}'
+            pages[f'{name} ?before'] = f'{address}?before={cursor}'
+            pages[f'{name} ?page=2'] = f'{address}?page=2'
+        for name in ('post_detail', 'api_post_comments'):
+            pages[name] = reverse(
+                f'posts:{name}', kwargs={'post_id': post.pk}
+            )
+        return pages
+
+    def explain(self, client, pages):
+        problems = []
+        for name, address in pages.items():
+            with CaptureQueriesContext(connection) as context:
+                client.get(address)
+            self.stdout.write(f'== {name} ({address})')
+            for query in context.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT'):
+                    continue
+                with connection.cursor() as cursor:
+                    cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                    plan = cursor.fetchall()
+                self.stdout.write(f'  {sql}')
+                for step in plan:
+                    self.stdout.write(f'    {step[-1]}')
+                problems.extend(
+                    f'{name}: {detail} <- {sql}' for detail in bad_steps(plan)
+                )
+        return problems
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('EXPLAIN QUERY PLAN есть только в SQLite.')
+        # Свой пустой кэш: иначе закэшированная лента не выполнит
+        # запросов, а засеянные посты останутся в общем кэше.
+        with sandbox():
+            reader, author, group, post = self.seed(options)
+            client = Client()
+            client.force_login(reader)
+            problems = self.explain(client, self.pages(author, group, post))
+        if problems:
+            raise CommandError(
+                'Запросы без подходящего индекса:\n' + '\n'.join(problems)
+            )
+        self.stdout.write(
+            self.style.SUCCESS('Все запросы лент идут по индексам')
+        )
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from posts import export
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты, комментарии или подписки в CSV или JSONL '
+        'порциями по ключу, не держа выборку в памяти.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(export.EXPORTS))
+        parser.add_argument('--format', choices=export.FORMATS, default='csv')
+        parser.add_argument('--output', help='Файл; по умолчанию stdout.')
+        parser.add_argument('--author', help='Имя пользователя автора.')
+        parser.add_argument('--group', help='slug группы.')
+        parser.add_argument('--since', help='Дата или дата-время, с.')
+        parser.add_argument('--until', help='Дата или дата-время, по.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=export.CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size должен быть больше 0')
+        try:
+            rows = export.rows(
+                options['kind'],
+                chunk_size=options['chunk_size'],
+                author=options['author'],
+                group=options['group'],
+                since=options['since'],
+                until=options['until'],
+            )
+            lines = export.lines(options['kind'], options['format'], rows)
+            if options['output']:
+                with open(options['output'], 'w', newline='',
+                          encoding='utf-8') as output:
+                    output.writelines(lines)
+            else:
+                for line in lines:
+                    self.stdout.write(line, ending='')
+        except export.ExportError as error:
+            raise CommandError(error)
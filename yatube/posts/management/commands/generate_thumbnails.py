@@ -0,0 +1,48 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Строит недостающие миниатюры картинок постов в несколько потоков.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=max(thumbnails.WORKERS, 1) * 2
+        )
+        parser.add_argument('--chunk', type=int, default=500)
+
+    def chunks(self, size):
+        """Имена картинок пачками по id, без открытого курсора.
+
+        Пока пачка обрабатывается, чтение из базы не держит блокировку,
+        и потоки могут писать в KV-хранилище sorl.
+        """
+        last_pk = 0
+        while True:
+            rows = list(
+                Post.objects.exclude(image='')
+                .filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', 'image')[:size]
+            )
+            if not rows:
+                return
+            last_pk = rows[-1][0]
+            yield [name for _, name in rows]
+
+    def handle(self, *args, **options):
+        done = failed = 0
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for chunk in self.chunks(options['chunk']):
+                for ok in pool.map(thumbnails.generate_in_worker, chunk):
+                    done += ok
+                    failed += not ok
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {done}, с ошибками: {failed}, за {elapsed:.1f} с'
+        ))
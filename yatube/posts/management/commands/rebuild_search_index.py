@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает полнотекстовый индекс постов и комментариев.'
+
+    def handle(self, *args, **options):
+        index = search.get_index()
+        with transaction.atomic():
+            index.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс пересобран ({type(index).__name__})'
+        ))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from posts import suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рекомендации «На кого подписаться» по всему графу '
+        'подписок и сохраняет лучших авторов для каждого пользователя.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=suggestions.TOP_K)
+        parser.add_argument(
+            '--chunk', type=int, default=suggestions.CHUNK_SIZE,
+            help='Пользователей в одной транзакции записи.'
+        )
+
+    def handle(self, *args, **options):
+        if options['top'] < 1 or options['chunk'] < 1:
+            raise CommandError('--top и --chunk должны быть больше 0')
+        started = time.perf_counter()
+        written = suggestions.refresh(options['top'], options['chunk'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Рекомендаций: {written}, за {elapsed:.1f} с'
+        ))
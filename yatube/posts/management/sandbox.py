@@ -0,0 +1,46 @@
+"""Окружение для команд, которые засевают данные в рабочую базу.
+
+Засеянное откатывается вместе с транзакцией, но общий кэш откатить
+нельзя: отрисованные фрагменты, счётчики пагинатора и записи миниатюр
+остались бы в нём под версиями, которые bulk_create не меняет, и живой
+сайт показывал бы несуществующие посты. Поэтому на время команды
+все кэши подменяются своим пустым LocMemCache, а MEDIA_ROOT -
+временным каталогом. Пустой кэш заодно гарантирует, что каждый
+запрос страницы действительно доходит до базы.
+"""
+import tempfile
+from contextlib import contextmanager
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.test.utils import override_settings
+
+
+class Rollback(Exception):
+    """Откатывает засеянные данные после замеров."""
+
+
+@contextmanager
+def sandbox():
+    """Блок, все изменения которого в базе, кэше и файлах выбрасываются."""
+    private = {
+        alias: {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': f'sandbox-{alias}-{uuid4().hex}',
+        }
+        for alias in settings.CACHES
+    }
+    with tempfile.TemporaryDirectory() as media_root:
+        with override_settings(CACHES=private, MEDIA_ROOT=media_root):
+            try:
+                try:
+                    with transaction.atomic():
+                        yield
+                        raise Rollback
+                except Rollback:
+                    pass
+            finally:
+                for alias in private:
+                    caches[alias].clear()
@@ -0,0 +1,40 @@
+from django.db import OperationalError, migrations
+
+
+def create_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE posts_search USING fts5('
+            'post_text, comment_text, post_id UNINDEXED, '
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    except OperationalError:
+        # SQLite собран без FTS5: поиск будет работать через PythonIndex.
+        return
+    schema_editor.execute(
+        'INSERT INTO posts_search (rowid, post_text, comment_text, post_id) '
+        "SELECT 2 * id, text, '', id FROM posts_post"
+    )
+    schema_editor.execute(
+        'INSERT INTO posts_search (rowid, post_text, comment_text, post_id) '
+        "SELECT 2 * id + 1, '', text, post_id FROM posts_comment"
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_suggestions'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='authorstats',
+            index=models.Index(fields=['-followers_count', 'user'], name='stats_followers_idx'),
+        ),
+    ]
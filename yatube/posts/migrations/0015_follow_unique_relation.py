@@ -0,0 +1,50 @@
+"""Уникальность подписки (user, author).
+
+Ограничение было в модели Follow, но не в 0008_follow, поэтому в базе
+могли накопиться повторные подписки, и AddConstraint на ней упал бы.
+Перед ним остаётся самая ранняя подписка каждой пары, а счётчики
+подписок и подписчиков затронутых пользователей пересчитываются.
+Записи лент от повторов не зависят: 0009 заполняет их с DISTINCT.
+"""
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    Follow = apps.get_model('posts', 'Follow')
+    first = Follow.objects.values('user', 'author').annotate(
+        first=Min('pk')
+    ).values('first')
+    duplicates = Follow.objects.exclude(pk__in=first)
+    pairs = set(duplicates.values_list('user_id', 'author_id'))
+    if not pairs:
+        return
+    duplicates.delete()
+    for user_id in {user_id for user_id, _ in pairs}:
+        AuthorStats.objects.filter(user_id=user_id).update(
+            following_count=Follow.objects.filter(user_id=user_id).count()
+        )
+    for author_id in {author_id for _, author_id in pairs}:
+        AuthorStats.objects.filter(user_id=author_id).update(
+            followers_count=Follow.objects.filter(
+                author_id=author_id
+            ).count()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_popular_authors_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_follows, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('author', 'user'), name='unique relation'),
+        ),
+    ]
@@ -43,11 +43,30 @@ class Post(CreatedModel):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -72,6 +91,15 @@ class Comment(CreatedModel):
         help_text='Здесь необходимо указать текст вашего комментария.'
     )
 
+    class Meta:
+        ordering = ['pub_date']
+        indexes = [
+            models.Index(
+                fields=['post', 'pub_date', 'id'],
+                name='comment_post_date_idx'
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -88,9 +116,126 @@ class Follow(models.Model):
     )
 
     class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'author'],
+                name='follow_user_author_idx'
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['author', 'user'],
                 name='unique relation'
             )
         ]
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счётчики пользователя.
+
+    Поддерживаются сигналами через F-выражения; если разошлись с
+    данными, пересчитываются командой rebuild_counters.
+    """
+    user = models.OneToOneField(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+        indexes = [
+            # Самые читаемые авторы для рекомендаций.
+            models.Index(
+                fields=['-followers_count', 'user'],
+                name='stats_followers_idx'
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Материализованная лента подписок: строка на пару (читатель, пост).
+
+    Заполняется при публикации поста, дополняется при подписке и
+    чистится при отписке, поэтому лента читается одним проходом по
+    индексу (user, -pub_date, -id) без соединения с Follow.
+    """
+    user = models.ForeignKey(
+        User,
+        verbose_name='Читатель',
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        verbose_name='Пост',
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор поста',
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        ordering = ['-pub_date', '-id']
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-id'],
+                name='timeline_user_date_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique timeline entry'
+            )
+        ]
+
+
+class Suggestion(models.Model):
+    """Рекомендация «На кого подписаться»: строка на пару
+    (пользователь, автор) с местом в списке.
+
+    Пересчитывается целиком командой refresh_suggestions.
+    """
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='suggestions',
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор',
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    score = models.FloatField('Оценка')
+    rank = models.PositiveSmallIntegerField('Место')
+
+    class Meta:
+        ordering = ['user', 'rank']
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации'
+        indexes = [
+            models.Index(
+                fields=['user', 'rank'],
+                name='suggestion_user_rank_idx'
+            ),
+        ]
@@ -0,0 +1,281 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+В SQLite индекс - виртуальная таблица FTS5 posts_search: строка поста
+лежит в колонке post_text с rowid 2 * pk, строка комментария - в колонке
+comment_text с rowid 2 * pk + 1, чтобы обновление и удаление шли по rowid.
+Результат - посты, ранжированные по bm25, где совпадение в тексте поста
+весит вдвое больше совпадения в комментарии.
+
+Для других баз (или SQLite без FTS5) работает PythonIndex - инвертированный
+индекс в памяти процесса, который строится из базы при первом поиске.
+Он годится для разработки и одного процесса: правки из других процессов
+он увидит только после перезапуска или rebuild.
+
+Индекс обновляют сигналы posts.signals; после массовых операций в обход
+сигналов его пересобирает команда rebuild_search_index.
+"""
+import math
+import re
+from collections import Counter, defaultdict
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Comment, Post
+
+TABLE = 'posts_search'
+# Во сколько раз совпадение в посте важнее совпадения в комментарии.
+POST_WEIGHT = 2.0
+COMMENT_WEIGHT = 1.0
+
+TOKEN_RE = re.compile(r'\w+')
+
+_index = None
+
+
+def tokenize(text):
+    return [token.lower() for token in TOKEN_RE.findall(text)]
+
+
+def fts5_available():
+    return (
+        connection.vendor == 'sqlite'
+        and TABLE in connection.introspection.table_names()
+    )
+
+
+def get_index():
+    """Индекс для текущей базы; выбирается один раз на процесс."""
+    global _index
+    if _index is None:
+        _index = FTS5Index() if fts5_available() else PythonIndex()
+    return _index
+
+
+class FTS5Index:
+
+    def _execute(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def _match(self, query):
+        """Запрос FTS5: все слова обязательны, каждое - как префикс."""
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def _replace(self, rowid, post_text, comment_text, post_id):
+        self._execute(
+            f'INSERT OR REPLACE INTO {TABLE} '
+            '(rowid, post_text, comment_text, post_id) '
+            'VALUES (%s, %s, %s, %s)',
+            (rowid, post_text, comment_text, post_id)
+        )
+
+    def add_post(self, post):
+        self._replace(2 * post.pk, post.text, '', post.pk)
+
+    def add_comment(self, comment):
+        self._replace(
+            2 * comment.pk + 1, '', comment.text, comment.post_id
+        )
+
+    def remove_post(self, post_id):
+        self._execute(f'DELETE FROM {TABLE} WHERE rowid = %s', (2 * post_id,))
+
+    def remove_comment(self, comment_id):
+        self._execute(
+            f'DELETE FROM {TABLE} WHERE rowid = %s', (2 * comment_id + 1,)
+        )
+
+    def remove_post_comments(self, post_id):
+        """Удаляет строки всех комментариев поста одним запросом."""
+        self._execute(
+            f'DELETE FROM {TABLE} WHERE rowid IN '
+            f'(SELECT 2 * id + 1 FROM {Comment._meta.db_table} '
+            f'WHERE post_id = %s)',
+            (post_id,)
+        )
+
+    def count(self, query):
+        match = self._match(query)
+        if match is None:
+            return 0
+        return self._execute(
+            f'SELECT COUNT(DISTINCT post_id) FROM {TABLE} '
+            f'WHERE {TABLE} MATCH %s',
+            (match,)
+        )[0][0]
+
+    def ranked_ids(self, query, limit, offset=0):
+        match = self._match(query)
+        if match is None:
+            return []
+        # bm25 нельзя звать внутри агрегата, поэтому сначала подзапрос;
+        # LIMIT -1 не даёт SQLite развернуть его во внешний запрос.
+        rows = self._execute(
+            'SELECT post_id, MIN(score) AS best FROM ('
+            f'SELECT post_id, bm25({TABLE}, %s, %s) AS score '
+            f'FROM {TABLE} WHERE {TABLE} MATCH %s LIMIT -1'
+            ') GROUP BY post_id ORDER BY best, post_id DESC '
+            'LIMIT %s OFFSET %s',
+            (POST_WEIGHT, COMMENT_WEIGHT, match, limit, offset)
+        )
+        return [post_id for post_id, _ in rows]
+
+    def filter(self, queryset, query):
+        """Посты queryset, найденные по query, одним подзапросом."""
+        match = self._match(query)
+        if match is None:
+            return queryset.none()
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT post_id FROM {TABLE} WHERE {TABLE} MATCH %s', (match,)
+        ))
+
+    def rebuild(self):
+        """Пересобирает индекс двумя INSERT ... SELECT."""
+        post_table = Post._meta.db_table
+        comment_table = Comment._meta.db_table
+        self._execute(f'DELETE FROM {TABLE}')
+        self._execute(
+            f'INSERT INTO {TABLE} (rowid, post_text, comment_text, post_id) '
+            f"SELECT 2 * id, text, '', id FROM {post_table}"
+        )
+        self._execute(
+            f'INSERT INTO {TABLE} (rowid, post_text, comment_text, post_id) '
+            f"SELECT 2 * id + 1, '', text, post_id FROM {comment_table}"
+        )
+        self._execute(
+            f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')"
+        )
+
+
+class PythonIndex:
+    """Инвертированный индекс в памяти: слово -> {документ: частота}."""
+
+    def __init__(self):
+        self.built = False
+
+    def _clear(self):
+        self.postings = defaultdict(dict)
+        # Документ ('post' | 'comment', pk) -> (pk поста, вес, слова).
+        self.documents = {}
+
+    def _add(self, key, post_id, weight, text):
+        self._remove(key)
+        terms = Counter(tokenize(text))
+        self.documents[key] = (post_id, weight, terms)
+        for term, frequency in terms.items():
+            self.postings[term][key] = frequency
+
+    def _remove(self, key):
+        document = self.documents.pop(key, None)
+        if document is None:
+            return
+        for term in document[2]:
+            self.postings[term].pop(key, None)
+            if not self.postings[term]:
+                del self.postings[term]
+
+    def _ensure_built(self):
+        if not self.built:
+            self.rebuild()
+
+    def add_post(self, post):
+        if self.built:
+            self._add(('post', post.pk), post.pk, POST_WEIGHT, post.text)
+
+    def add_comment(self, comment):
+        if self.built:
+            self._add(
+                ('comment', comment.pk), comment.post_id,
+                COMMENT_WEIGHT, comment.text
+            )
+
+    def remove_post(self, post_id):
+        if self.built:
+            self._remove(('post', post_id))
+
+    def remove_comment(self, comment_id):
+        if self.built:
+            self._remove(('comment', comment_id))
+
+    def remove_post_comments(self, post_id):
+        if self.built:
+            for pk in Comment.objects.filter(post_id=post_id).values_list(
+                'pk', flat=True
+            ):
+                self._remove(('comment', pk))
+
+    def _scores(self, query):
+        """{pk поста: вес} для постов, где есть все слова запроса."""
+        self._ensure_built()
+        tokens = set(tokenize(query))
+        if not tokens:
+            return {}
+        total = len(self.documents) or 1
+        per_token = []
+        for token in tokens:
+            scores = defaultdict(float)
+            # Как и в FTS5, каждое слово запроса - префикс.
+            for term in self.postings:
+                if not term.startswith(token):
+                    continue
+                postings = self.postings[term]
+                idf = math.log(1 + total / len(postings))
+                for key, frequency in postings.items():
+                    post_id, weight, _ = self.documents[key]
+                    scores[post_id] += weight * frequency * idf
+            per_token.append(scores)
+        found = set.intersection(*(set(scores) for scores in per_token))
+        return {
+            post_id: sum(scores[post_id] for scores in per_token)
+            for post_id in found
+        }
+
+    def count(self, query):
+        return len(self._scores(query))
+
+    def ranked_ids(self, query, limit, offset=0):
+        scores = self._scores(query)
+        ranked = sorted(scores, key=lambda pk: (-scores[pk], -pk))
+        return ranked[offset:offset + limit]
+
+    def filter(self, queryset, query):
+        return queryset.filter(pk__in=list(self._scores(query)))
+
+    def rebuild(self):
+        self._clear()
+        for pk, text in Post.objects.values_list('pk', 'text').iterator():
+            self._add(('post', pk), pk, POST_WEIGHT, text)
+        comments = Comment.objects.values_list('pk', 'post_id', 'text')
+        for pk, post_id, text in comments.iterator():
+            self._add(('comment', pk), post_id, COMMENT_WEIGHT, text)
+        self.built = True
+
+
+class SearchResults:
+    """Ранжированные посты для Paginator: len() и срезы.
+
+    Срез выполняет один запрос к индексу и один - за постами страницы.
+    """
+
+    def __init__(self, text, index=None):
+        self.text = text
+        self.index = index or get_index()
+
+    def count(self):
+        return self.index.count(self.text)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start = key.start or 0
+        ids = self.index.ranked_ids(self.text, key.stop - start, start)
+        posts = Post.objects.select_related('author', 'group').in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
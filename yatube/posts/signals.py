@@ -0,0 +1,131 @@
+import threading
+
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import caching, counters, follow_graph, search, thumbnails, timeline
+from .models import Comment, Follow, Group, Post
+
+# Посты, которые сейчас удаляются в этом потоке. Их комментарии удаляет
+# каскад: счётчик комментариев и кэш страницы уходят вместе с постом,
+# а строки поиска снимает post_deleting одним запросом.
+_deleting = threading.local()
+
+
+def _deleting_posts():
+    if not hasattr(_deleting, 'posts'):
+        _deleting.posts = set()
+    return _deleting.posts
+
+
+def _post_scopes(post):
+    scopes = [
+        caching.INDEX,
+        caching.profile_scope(post.author_id),
+        caching.post_scope(post.pk),
+    ]
+    for group_id in {post.group_id, getattr(post, '_old_group_id', None)}:
+        if group_id is not None:
+            scopes.append(caching.group_scope(group_id))
+    return scopes
+
+
+def _group_scopes(group):
+    authors = (
+        Post.objects.filter(group=group)
+        .values_list('author_id', flat=True)
+        .distinct()
+    )
+    return [caching.group_scope(group.pk)] + [
+        caching.profile_scope(author_id) for author_id in authors
+    ]
+
+
+def _follow_scopes(follow):
+    # Счётчики подписок и кнопка подписки - на страницах обоих профилей.
+    return [
+        caching.profile_scope(follow.user_id),
+        caching.profile_scope(follow.author_id),
+    ]
+
+
+@receiver(pre_save, sender=Post)
+def post_remember_group(sender, instance, **kwargs):
+    if instance.pk is not None:
+        instance._old_group_id = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out(instance)
+        counters.change_user(instance.author_id, 'posts_count', 1)
+    if instance.image:
+        thumbnails.schedule(instance)
+    search.get_index().add_post(instance)
+    caching.invalidate_on_commit(*_post_scopes(instance))
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    _deleting_posts().add(instance.pk)
+    search.get_index().remove_post_comments(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    _deleting_posts().discard(instance.pk)
+    counters.change_user(instance.author_id, 'posts_count', -1)
+    search.get_index().remove_post(instance.pk)
+    caching.invalidate_on_commit(*_post_scopes(instance))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_comments(instance.post_id, 1)
+    search.get_index().add_comment(instance)
+    caching.invalidate_on_commit(caching.post_scope(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id in _deleting_posts():
+        return
+    counters.change_comments(instance.post_id, -1)
+    search.get_index().remove_comment(instance.pk)
+    caching.invalidate_on_commit(caching.post_scope(instance.post_id))
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    caching.invalidate_on_commit(*_group_scopes(instance))
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    caching.invalidate_on_commit(*_group_scopes(instance))
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        timeline.backfill(instance.user_id, instance.author_id)
+        follow_graph.follow(instance.user_id, instance.author_id)
+        counters.change_user(instance.user_id, 'following_count', 1)
+        counters.change_user(instance.author_id, 'followers_count', 1)
+        caching.invalidate_on_commit(*_follow_scopes(instance))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    timeline.prune(instance.user_id, instance.author_id)
+    follow_graph.unfollow(instance.user_id, instance.author_id)
+    counters.change_user(instance.user_id, 'following_count', -1)
+    counters.change_user(instance.author_id, 'followers_count', -1)
+    caching.invalidate_on_commit(*_follow_scopes(instance))
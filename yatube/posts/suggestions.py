@@ -0,0 +1,183 @@
+"""Рекомендации «На кого подписаться».
+
+Подписки - разреженная матрица A: A[u, a] = 1, если u подписан на a.
+Оценка автора x для пользователя u складывается из двух произведений,
+которые считаются пакетно по всему графу, а не запросами на каждого:
+
+- друзья друзей, (A·A)[u, x] - сколько авторов, на которых подписан u,
+  сами подписаны на x;
+- со-подписки, (A·S)[u, x], где S - AᵀA с косинусной нормировкой:
+  насколько подписчики авторов u совпадают с подписчиками x. У каждого
+  автора остаётся только MAX_SIMILAR самых похожих, поэтому вторая
+  часть стоит O(подписок · MAX_SIMILAR).
+
+Строки матриц - отсортированные массивы follow_graph, произведение
+строк - сложение в Counter. Расчёт S стоит сумму квадратов числа
+подписок пользователей; тех, у кого подписок больше MAX_DEGREE, он
+пропускает: о похожести авторов они говорят мало, а стоят дорого.
+
+Лучшие TOP_K авторов пишутся в Suggestion порциями пользователей,
+а страницы берут их через for_user из кэша - без запросов к базе,
+пока не сменилась версия caching.SUGGESTIONS.
+"""
+import heapq
+from collections import Counter
+from math import sqrt
+
+from django.core.cache import cache
+from django.db import transaction
+
+from . import caching, follow_graph
+from .models import AuthorStats, Suggestion
+
+TOP_K = 20
+SHOWN = 5
+MAX_SIMILAR = 50
+MAX_DEGREE = 1000
+CHUNK_SIZE = 1000
+
+SUGGESTIONS_KEY = 'posts:suggestions:{}:{}'
+SUGGESTIONS_TIMEOUT = 24 * 60 * 60
+
+
+def similar_authors(graph, limit=MAX_SIMILAR):
+    """Строки S: {автор: [(похожий автор, вес), ...]}."""
+    similar = {}
+    for author_id in graph.authors():
+        followers = graph.followers(author_id)
+        overlap = Counter()
+        for user_id in followers:
+            following = graph.following(user_id)
+            if len(following) <= MAX_DEGREE:
+                overlap.update(following)
+        del overlap[author_id]
+        best = heapq.nlargest(limit, overlap.items(), key=_by_score)
+        similar[author_id] = [
+            (other_id, count / sqrt(
+                len(followers) * len(graph.followers(other_id))
+            ))
+            for other_id, count in best
+        ]
+    return similar
+
+
+def _by_score(item):
+    # При равной оценке выше тот, у кого меньше id: порядок не зависит
+    # от обхода словарей.
+    return item[1], -item[0]
+
+
+def scores(graph, similar, user_id):
+    """Строка A·A + A·S для одного пользователя без уже подписанных."""
+    following = graph.following(user_id)
+    total = Counter()
+    for author_id in following:
+        total.update(graph.following(author_id))
+    for author_id in following:
+        for other_id, weight in similar.get(author_id, ()):
+            total[other_id] += weight
+    total.pop(user_id, None)
+    for author_id in following:
+        total.pop(author_id, None)
+    return total
+
+
+def top(graph, similar, user_id, count=TOP_K):
+    return heapq.nlargest(
+        count, scores(graph, similar, user_id).items(), key=_by_score
+    )
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def refresh(top_k=TOP_K, chunk_size=CHUNK_SIZE):
+    """Пересчитывает таблицу рекомендаций и возвращает число строк.
+
+    Пишется порциями пользователей в отдельных транзакциях, чтобы не
+    держать блокировку записи на весь расчёт; у пользователей без
+    подписок старые строки удаляются.
+    """
+    graph = follow_graph.FollowGraph()
+    graph.rebuild(None)
+    similar = similar_authors(graph)
+    written = 0
+    last = 0
+    for users in _chunks(graph.users(), chunk_size):
+        rows = [
+            Suggestion(user_id=user_id, author_id=author_id, score=score,
+                       rank=rank)
+            for user_id in users
+            for rank, (author_id, score) in enumerate(
+                top(graph, similar, user_id, top_k)
+            )
+        ]
+        with transaction.atomic():
+            Suggestion.objects.filter(
+                user_id__gt=last, user_id__lte=users[-1]
+            ).delete()
+            Suggestion.objects.bulk_create(rows)
+        last = users[-1]
+        written += len(rows)
+    Suggestion.objects.filter(user_id__gt=last).delete()
+    caching.invalidate(caching.SUGGESTIONS)
+    return written
+
+
+def _authors(rows):
+    return [
+        {
+            'id': author_id,
+            'username': username,
+            'name': f'{first_name} {last_name}'.strip() or username,
+        }
+        for author_id, username, first_name, last_name in rows
+    ]
+
+
+def _stored(user_id):
+    return _authors(
+        Suggestion.objects.filter(user_id=user_id).order_by('rank')
+        .values_list(
+            'author_id', 'author__username',
+            'author__first_name', 'author__last_name'
+        )
+    )
+
+
+def _popular(version):
+    """Самые читаемые авторы - для тех, у кого ещё нет подписок."""
+    key = SUGGESTIONS_KEY.format(version, 'popular')
+    authors = cache.get(key)
+    if authors is None:
+        authors = _authors(
+            AuthorStats.objects.filter(followers_count__gt=0)
+            .order_by('-followers_count', 'user_id')
+            .values_list(
+                'user_id', 'user__username',
+                'user__first_name', 'user__last_name'
+            )[:TOP_K]
+        )
+        cache.set(key, authors, SUGGESTIONS_TIMEOUT)
+    return authors
+
+
+def for_user(user_id, graph, count=SHOWN):
+    """До count рекомендаций пользователю: {'id', 'username', 'name'}.
+
+    Список читается из кэша; авторов, на которых пользователь подписался
+    после пересчёта, отсеивает граф подписок.
+    """
+    version = caching.listing_version(caching.SUGGESTIONS)
+    key = SUGGESTIONS_KEY.format(version, user_id)
+    authors = cache.get(key)
+    if authors is None:
+        authors = _stored(user_id) or _popular(version)
+        cache.set(key, authors, SUGGESTIONS_TIMEOUT)
+    followed = set(graph.following(user_id))
+    followed.add(user_id)
+    return [
+        author for author in authors if author['id'] not in followed
+    ][:count]
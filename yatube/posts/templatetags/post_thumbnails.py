@@ -0,0 +1,74 @@
+import logging
+
+from django import template
+from posts.thumbnails import (DEFAULT_FORMAT, build_now, prefetch,
+                              schedule_missing, source_missing, variants)
+
+logger = logging.getLogger(__name__)
+
+register = template.Library()
+
+MIME_TYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'WEBP': 'image/webp',
+}
+
+
+def _build(post, variant):
+    try:
+        return build_now(post.image, variant)
+    except Exception:
+        logger.exception('Не удалось построить миниатюру поста %s', post.pk)
+        return None
+
+
+@register.inclusion_tag('includes/picture.html')
+def post_picture(thumbnails, post, geometry, sizes=None):
+    """<picture> со всеми вариантами картинки поста для геометрии.
+
+    Браузер берёт из srcset ширину под экран и WebP, если понимает его;
+    width и height резервируют место до загрузки, а loading="lazy"
+    откладывает загрузку картинок за пределами экрана.
+
+    Готовые варианты берутся из карты thumbnails.prefetch (без неё -
+    одним prefetch на пост). Недостающий основной вариант строится
+    сразу, остальные - в пуле, а до тех пор их нет в srcset.
+    """
+    if not post.image or source_missing(post.image):
+        return {}
+    if thumbnails is None:
+        thumbnails = prefetch([post])
+    width, height = (int(side) for side in geometry.split('x'))
+    srcsets, src, missing = {}, None, False
+    for variant in variants(geometry):
+        image = thumbnails.get((post.pk, variant.geometry, variant.format))
+        if image is None and (
+            variant.format == DEFAULT_FORMAT and variant.width == width
+        ):
+            image = _build(post, variant)
+            if image is None:
+                return {}
+        if image is None:
+            missing = True
+            continue
+        srcsets.setdefault(variant.format, []).append(
+            f'{image.url} {variant.width}w'
+        )
+        if variant.format == DEFAULT_FORMAT and variant.width == width:
+            src = image.url
+    if missing:
+        schedule_missing(post)
+    if src is None:
+        return {}
+    return {
+        'sources': [
+            {'type': MIME_TYPES[fmt], 'srcset': ', '.join(srcset)}
+            for fmt, srcset in srcsets.items() if fmt != DEFAULT_FORMAT
+        ],
+        'src': src,
+        'srcset': ', '.join(srcsets[DEFAULT_FORMAT]),
+        'sizes': sizes or f'(max-width: {width}px) 100vw, {width}px',
+        'width': width,
+        'height': height,
+    }
@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import counters
+from ..models import Group, Post
+from .utils import query_budget
+
+User = get_user_model()
+
+GROUPS: int = 20
+POSTS: int = 30
+
+
+class PostAdminTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        Group.objects.bulk_create(
+            Group(title=f'Группа {i}', slug=f'group{i}', description='-')
+            for i in range(GROUPS)
+        )
+        groups = list(Group.objects.all())
+        Post.objects.bulk_create(
+            Post(
+                text=f'Пост {i}',
+                author=cls.admin,
+                group=groups[i % GROUPS] if i % 2 else None
+            )
+            for i in range(POSTS)
+        )
+        counters.rebuild()
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(PostAdminTests.admin)
+
+    def test_changelist_does_not_embed_every_group(self):
+        # Сессия, пользователь, две даты для фильтра, число строк, строки.
+        with query_budget(6):
+            response = self.client.get(
+                reverse('admin:posts_post_changelist')
+            )
+        self.assertEqual(response.status_code, 200)
+        rows = len(response.context['cl'].result_list)
+        # В каждой строке - пустой вариант и, если есть, текущая группа.
+        self.assertLessEqual(
+            response.content.decode().count('<option'), rows * 2
+        )
+        self.assertContains(response, 'Группа 1')
+
+    def test_full_list_is_counted_by_counters(self):
+        address = reverse('admin:posts_post_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(address)
+        self.assertEqual(response.context['cl'].result_count, POSTS)
+        self.assertFalse(any(
+            'COUNT(*)' in query['sql'] for query in queries.captured_queries
+        ))
+
+    def test_filtered_count_is_cached(self):
+        address = reverse('admin:posts_post_changelist')
+        year = str(Post.objects.first().pub_date.year)
+        self.client.get(address, {'published': year})
+        with query_budget(5):
+            response = self.client.get(address, {'published': year})
+        self.assertEqual(response.context['cl'].result_count, POSTS)
+
+    def test_pub_date_filter_by_year(self):
+        year = Post.objects.first().pub_date.year
+        address = reverse('admin:posts_post_changelist')
+        response = self.client.get(address, {'published': str(year)})
+        self.assertEqual(response.context['cl'].result_count, POSTS)
+        response = self.client.get(address, {'published': str(year - 1)})
+        self.assertEqual(response.context['cl'].result_count, 0)
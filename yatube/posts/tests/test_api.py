@@ -0,0 +1,102 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import thumbnails
+from ..models import Comment, Group, Post
+from ..views import POSTS_COUNT
+from .utils import on_commit_callbacks
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ApiTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='group',
+            description='Описание'
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.author, group=cls.group)
+            for i in range(POSTS_COUNT + 3)
+        )
+        buffer = BytesIO()
+        Image.new('RGB', (40, 20), 'red').save(buffer, 'JPEG')
+        cls.post = Post(text='С картинкой', author=cls.author)
+        cls.post.image.save(
+            'api.jpg', ContentFile(buffer.getvalue()), save=False
+        )
+        cls.post.save()
+        thumbnails.generate(cls.post.image.name)
+        Comment.objects.create(post=cls.post, author=cls.author, text='Ок')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+
+    def test_feed_pages_follow_cursor(self):
+        address = reverse('posts:api_group_list', kwargs={'slug': 'group'})
+        first = self.guest.get(address).json()
+        self.assertEqual(len(first['results']), POSTS_COUNT)
+        self.assertIsNone(first['previous'])
+        second = self.guest.get(address, {'cursor': first['next']}).json()
+        self.assertEqual(len(second['results']), 3)
+        self.assertIsNone(second['next'])
+        ids = [post['id'] for post in first['results'] + second['results']]
+        self.assertEqual(len(set(ids)), POSTS_COUNT + 3)
+
+    def test_post_has_image_and_thumbnails(self):
+        data = self.guest.get(reverse('posts:api_post_detail', kwargs={
+            'post_id': ApiTests.post.pk
+        })).json()
+        self.assertEqual(data['author'], 'author')
+        self.assertEqual(data['comments_count'], 1)
+        self.assertEqual(data['image'], ApiTests.post.image.url)
+        self.assertEqual(
+            set(data['thumbnails']),
+            {geometry for geometry, _ in thumbnails.GEOMETRIES}
+        )
+
+    def test_feed_is_cached_until_scope_changes(self):
+        address = reverse('posts:api_profile', kwargs={'username': 'author'})
+        self.guest.get(address)
+        with self.assertNumQueries(1):
+            self.guest.get(address)
+        with on_commit_callbacks():
+            Post.objects.create(text='Свежий', author=ApiTests.author)
+        self.assertEqual(
+            self.guest.get(address).json()['results'][0]['text'], 'Свежий'
+        )
+
+    def test_comments_and_missing_post(self):
+        comments = self.guest.get(reverse('posts:api_post_comments', kwargs={
+            'post_id': ApiTests.post.pk
+        })).json()
+        self.assertEqual(
+            [comment['text'] for comment in comments['results']], ['Ок']
+        )
+        response = self.guest.get(
+            reverse('posts:api_post_detail', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,110 @@
+import csv
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import export
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ExportTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='group',
+            description='Описание'
+        )
+        for i in range(5):
+            Post.objects.create(
+                text=f'Пост {i}',
+                author=cls.author,
+                group=cls.group if i % 2 else None
+            )
+        cls.old = Post.objects.create(text='Старый', author=cls.other)
+        Post.objects.filter(pk=cls.old.pk).update(
+            pub_date=timezone.now() - timedelta(days=30)
+        )
+        Comment.objects.create(
+            post=Post.objects.filter(group=cls.group).first(),
+            author=cls.other,
+            text='Комментарий'
+        )
+        Follow.objects.create(user=cls.other, author=cls.author)
+
+    def setUp(self):
+        self.staff_client = Client()
+        self.staff_client.force_login(ExportTests.staff)
+
+    def test_rows_are_read_in_key_chunks(self):
+        rows = export.rows('posts', chunk_size=2, author='author')
+        # Три порции по pk: 2 + 2 + 1 строка.
+        with self.assertNumQueries(3):
+            texts = [row['text'] for row in rows]
+        self.assertEqual(texts, [f'Пост {i}' for i in range(5)])
+
+    def test_filters_are_pushed_to_sql(self):
+        since = (timezone.now() - timedelta(days=1)).date().isoformat()
+        cases = {
+            'group': (export.queryset('posts', group='group'), 2),
+            'since': (export.queryset('posts', since=since), 5),
+            'until': (export.queryset('posts', until=since), 1),
+            'comments by group': (
+                export.queryset('comments', group='group'), 1
+            ),
+        }
+        for name, (queryset, expected) in cases.items():
+            with self.subTest(name=name):
+                self.assertIn('WHERE', str(queryset.query))
+                self.assertEqual(queryset.count(), expected)
+        with self.assertRaises(export.ExportError):
+            export.queryset('follows', group='group')
+        with self.assertRaises(export.ExportError):
+            export.queryset('posts', since='вчера')
+
+    def test_endpoint_streams_csv_to_staff(self):
+        address = reverse('posts:export', kwargs={'kind': 'posts'})
+        response = self.staff_client.get(address, {'author': 'author'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        content = b''.join(response.streaming_content).decode()
+        table = list(csv.DictReader(StringIO(content)))
+        self.assertEqual(len(table), 5)
+        self.assertEqual(table[0]['author'], 'author')
+
+        guest = Client().get(address)
+        self.assertEqual(guest.status_code, 302)
+        bad = self.staff_client.get(
+            reverse('posts:export', kwargs={'kind': 'users'})
+        )
+        self.assertEqual(bad.status_code, 400)
+
+    def test_command_writes_jsonl(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'follows.jsonl')
+            call_command(
+                'export_data', 'follows', format='jsonl', output=path,
+                chunk_size=1
+            )
+            with open(path, encoding='utf-8') as output:
+                rows = [json.loads(line) for line in output]
+        self.assertEqual(rows, [{
+            'id': Follow.objects.get().pk,
+            'user': 'other',
+            'author': 'author',
+        }])
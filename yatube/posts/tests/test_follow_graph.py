@@ -0,0 +1,195 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from django.test import TestCase, TransactionTestCase
+
+from .. import follow_graph
+from ..models import Follow
+
+User = get_user_model()
+
+
+class FollowGraphTests(TransactionTestCase):
+
+    def setUp(self):
+        self.first = User.objects.create_user(username='first')
+        self.second = User.objects.create_user(username='second')
+        self.third = User.objects.create_user(username='third')
+
+    def tearDown(self):
+        # Удаление через ORM, чтобы граф процесса не пережил очистку базы.
+        Follow.objects.all().delete()
+
+    def follow(self, user, author):
+        Follow.objects.create(user=user, author=author)
+
+    def test_answers_from_memory(self):
+        self.follow(self.first, self.second)
+        self.follow(self.first, self.third)
+        self.follow(self.third, self.second)
+        graph = follow_graph.get_graph()
+        self.assertIsInstance(graph, follow_graph.FollowGraph)
+        with self.assertNumQueries(0):
+            self.assertTrue(graph.follows(self.first.pk, self.second.pk))
+            self.assertFalse(graph.follows(self.second.pk, self.first.pk))
+            self.assertEqual(
+                list(graph.following(self.first.pk)),
+                sorted([self.second.pk, self.third.pk])
+            )
+            self.assertEqual(
+                list(graph.followers(self.second.pk)),
+                sorted([self.first.pk, self.third.pk])
+            )
+            self.assertEqual(list(graph.followers(self.first.pk)), [])
+
+    def test_signals_keep_graph_current(self):
+        follow_graph.get_graph()
+        self.follow(self.first, self.second)
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                follow_graph.get_graph().follows(self.first.pk, self.second.pk)
+            )
+        self.first.follower.filter(author=self.second).delete()
+        with self.assertNumQueries(0):
+            self.assertFalse(
+                follow_graph.get_graph().follows(self.first.pk, self.second.pk)
+            )
+
+    def test_change_in_another_process_is_replayed(self):
+        graph = follow_graph.get_graph()
+        # Другой процесс записал подписку в базу и в журнал.
+        Follow.objects.bulk_create([
+            Follow(user=self.first, author=self.second)
+        ])
+        follow_graph._record((self.first.pk, self.second.pk, True))
+        with self.assertNumQueries(0):
+            self.assertIs(follow_graph.get_graph(), graph)
+            self.assertTrue(graph.follows(self.first.pk, self.second.pk))
+
+    def test_older_version_is_already_applied(self):
+        graph = follow_graph.get_graph()
+        stale = graph.version
+        self.follow(self.first, self.second)
+        follow_graph.get_graph()
+        # Поток прочитал версию до того, как другой поток применил новую.
+        with self.assertNumQueries(0):
+            graph.update(stale)
+        self.assertEqual(graph.version, stale + 1)
+        self.assertTrue(graph.follows(self.first.pk, self.second.pk))
+
+    def test_ids_beyond_32_bits(self):
+        graph = follow_graph.FollowGraph()
+        graph._apply(2 ** 40, 2 ** 41, True)
+        self.assertTrue(graph.follows(2 ** 40, 2 ** 41))
+        self.assertEqual(list(graph.followers(2 ** 41)), [2 ** 40])
+        self.assertEqual(graph.authors(), [2 ** 41])
+
+    def test_change_without_log_rebuilds_graph(self):
+        follow_graph.get_graph()
+        Follow.objects.bulk_create([
+            Follow(user=self.first, author=self.second)
+        ])
+        cache.incr(follow_graph.VERSION_KEY)
+        self.assertTrue(
+            follow_graph.get_graph().follows(self.first.pk, self.second.pk)
+        )
+
+    def test_invalidate_rebuilds_graph(self):
+        follow_graph.get_graph()
+        Follow.objects.bulk_create([
+            Follow(user=self.first, author=self.second)
+        ])
+        follow_graph.invalidate()
+        with self.assertNumQueries(1):
+            graph = follow_graph.get_graph()
+        self.assertTrue(graph.follows(self.first.pk, self.second.pk))
+
+    def test_truncated_log_rebuilds_graph(self):
+        follow_graph.get_graph()
+        with mock.patch.object(follow_graph, 'LOG_SIZE', 1):
+            self.follow(self.first, self.second)
+            self.follow(self.third, self.second)
+            with self.assertNumQueries(1):
+                graph = follow_graph.get_graph()
+        self.assertEqual(
+            list(graph.followers(self.second.pk)),
+            sorted([self.first.pk, self.third.pk])
+        )
+
+    def new_process(self):
+        return mock.patch.object(
+            follow_graph, '_graph', follow_graph.FollowGraph()
+        )
+
+    def test_warm_up_builds_graph(self):
+        self.follow(self.first, self.second)
+        with self.new_process():
+            follow_graph.warm_up()
+            with self.assertNumQueries(0):
+                self.assertTrue(
+                    follow_graph.get_graph().follows(
+                        self.first.pk, self.second.pk
+                    )
+                )
+
+    def test_warm_up_without_database(self):
+        with self.new_process(), mock.patch.object(
+            follow_graph.FollowGraph, 'rebuild', side_effect=DatabaseError
+        ) as rebuild:
+            follow_graph.warm_up()
+        rebuild.assert_called_once()
+
+    def test_rolled_back_follow_is_forgotten(self):
+        follow_graph.get_graph()
+        try:
+            with transaction.atomic():
+                Follow.objects.create(user=self.first, author=self.second)
+                self.assertIsInstance(
+                    follow_graph.get_graph(), follow_graph.DatabaseGraph
+                )
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        with self.assertNumQueries(0):
+            graph = follow_graph.get_graph()
+        self.assertIsInstance(graph, follow_graph.FollowGraph)
+        self.assertFalse(graph.follows(self.first.pk, self.second.pk))
+
+    def test_missed_version_is_not_skipped(self):
+        follow_graph.get_graph()
+        Follow.objects.bulk_create([
+            Follow(user=self.first, author=self.second)
+        ])
+        cache.incr(follow_graph.VERSION_KEY)
+        self.follow(self.third, self.second)
+        graph = follow_graph.get_graph()
+        self.assertTrue(graph.follows(self.first.pk, self.second.pk))
+        self.assertTrue(graph.follows(self.third.pk, self.second.pk))
+
+
+class UncommittedFollowTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user')
+        cls.author = User.objects.create_user(username='author')
+
+    def test_uncommitted_follow_is_read_from_database(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        graph = follow_graph.get_graph()
+        self.assertIsInstance(graph, follow_graph.DatabaseGraph)
+        self.assertTrue(graph.follows(self.user.pk, self.author.pk))
+        self.assertEqual(list(graph.following(self.user.pk)), [self.author.pk])
+
+    def test_rolled_back_follow_is_forgotten(self):
+        try:
+            with transaction.atomic():
+                Follow.objects.create(user=self.user, author=self.author)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        graph = follow_graph.get_graph()
+        self.assertIsInstance(graph, follow_graph.FollowGraph)
+        self.assertFalse(graph.follows(self.user.pk, self.author.pk))
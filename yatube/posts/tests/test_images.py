@@ -0,0 +1,145 @@
+import json
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import images
+from ..models import Post
+
+User = get_user_model()
+
+ORIENTATION = 0x0112
+MAKE = 0x010F
+
+
+def jpeg(size, orientation=None, name='photo.jpg'):
+    image = Image.new('RGB', size, (200, 30, 30))
+    exif = Image.Exif()
+    exif[MAKE] = 'Camera'
+    if orientation:
+        exif[ORIENTATION] = orientation
+    output = BytesIO()
+    image.save(output, 'JPEG', exif=exif.tobytes())
+    return SimpleUploadedFile(name, output.getvalue(), 'image/jpeg')
+
+
+class NormalizeTests(TestCase):
+
+    def normalize(self, upload):
+        with self.assertLogs('posts.images', 'INFO') as logs:
+            normalized = images.normalize(upload)
+        return Image.open(normalized), json.loads(logs.records[0].getMessage())
+
+    def test_downscales_with_reduced_decode(self):
+        with mock.patch('posts.images.MAX_SIDE', 100):
+            image, record = self.normalize(jpeg((800, 600)))
+        self.assertEqual(image.size, (100, 75))
+        self.assertEqual(image.format, 'JPEG')
+        # JPEG декодирован сразу в масштабе 1/8, а не целиком.
+        self.assertLessEqual(record['decoded_bytes'], 800 * 600 * 3 // 16)
+        self.assertEqual(record['source_size'], [800, 600])
+
+    def test_applies_orientation_and_strips_exif(self):
+        image, record = self.normalize(jpeg((40, 20), orientation=6))
+        self.assertEqual(image.size, (20, 40))
+        self.assertEqual(dict(image.getexif()), {})
+
+    def test_keeps_transparency_in_png(self):
+        output = BytesIO()
+        Image.new('RGBA', (30, 30), (0, 0, 0, 0)).save(output, 'PNG')
+        upload = SimpleUploadedFile('logo.png', output.getvalue())
+        image, record = self.normalize(upload)
+        self.assertEqual(image.format, 'PNG')
+        self.assertEqual(record['name'], 'logo.png')
+
+    def test_rejects_too_many_pixels_before_decoding(self):
+        upload = jpeg((100, 100))
+        with mock.patch('posts.images.MAX_PIXELS', 1000):
+            with mock.patch.object(Image.Image, 'load') as load:
+                with self.assertRaises(ValidationError):
+                    images.normalize(upload)
+        load.assert_not_called()
+
+
+class UploadTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.settings_override.enable()
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(UploadTests.user)
+
+    def test_create_saves_normalized_image(self):
+        with self.assertLogs('posts.images', 'INFO'):
+            self.client.post(
+                reverse('posts:post_create'),
+                {'text': 'С картинкой', 'image': jpeg((60, 40), 8, 'a.jpeg')}
+            )
+        post = Post.objects.get(text='С картинкой')
+        self.assertEqual(post.image.name, 'posts/a.jpg')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (40, 60))
+
+    def test_too_large_upload_is_rejected(self):
+        with mock.patch('posts.images.MAX_UPLOAD_SIZE', 100):
+            response = self.client.post(
+                reverse('posts:post_create'),
+                {'text': 'Большая', 'image': jpeg((60, 40))}
+            )
+        self.assertFormError(response, 'form', 'image', 'Файл больше 0 МБ')
+        self.assertFalse(Post.objects.filter(text='Большая').exists())
+
+    @override_settings(CSRF_FAILURE_VIEW='django.views.csrf.csrf_failure')
+    def test_create_keeps_csrf_check(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(UploadTests.user)
+        response = client.post(
+            reverse('posts:post_create'),
+            {'text': 'Без токена', 'image': jpeg((60, 40))}
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Post.objects.filter(text='Без токена').exists())
+
+    def admin_add(self, text, image):
+        admin = User.objects.create_superuser('admin', 'admin@a.ru', 'pass')
+        self.client.force_login(admin)
+        return self.client.post(
+            reverse('admin:posts_post_add'),
+            {'text': text, 'author': UploadTests.user.pk, 'image': image}
+        )
+
+    def test_admin_saves_normalized_image(self):
+        with self.assertLogs('posts.images', 'INFO'):
+            self.admin_add('Из админки', jpeg((60, 40), 8, 'b.jpeg'))
+        post = Post.objects.get(text='Из админки')
+        self.assertEqual(post.image.name, 'posts/b.jpg')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (40, 60))
+
+    def test_admin_rejects_too_large_upload(self):
+        with mock.patch('posts.images.MAX_UPLOAD_SIZE', 100):
+            response = self.admin_add('Большая', jpeg((60, 40)))
+        self.assertEqual(response.status_code, 200)
+        form = response.context['adminform'].form
+        self.assertIn('Файл больше 0 МБ', form.errors['image'])
+        self.assertFalse(Post.objects.filter(text='Большая').exists())
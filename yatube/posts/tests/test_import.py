@@ -0,0 +1,147 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..management.commands import import_data
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ImportDataTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        Group.objects.create(title='Группа', slug='group', description='-')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as source:
+            source.write(content)
+        return path
+
+    def jsonl(self, name, rows):
+        return self.write(
+            name, ''.join(json.dumps(row) + '\n' for row in rows)
+        )
+
+    def run_import(self, kind, path, **options):
+        out, err = StringIO(), StringIO()
+        call_command(
+            'import_data', kind, path, stdout=out, stderr=err, **options
+        )
+        return out.getvalue(), err.getvalue()
+
+    def test_full_import(self):
+        self.run_import('users', self.jsonl('users.jsonl', [
+            {'username': 'leo', 'first_name': 'Лев'},
+            {'username': 'anna'},
+            {'username': 'bad name!'},
+        ]))
+        self.assertEqual(
+            set(User.objects.values_list('username', flat=True)),
+            {'leo', 'anna'}
+        )
+        posts = self.write(
+            'posts.csv',
+            'id,author,group,text,pub_date\n'
+            '100,leo,group,Первый пост,2001-02-03T04:05:06\n'
+            '101,anna,,Второй пост,\n'
+            '102,leo,,   ,\n'
+            '103,ghost,,Текст,\n'
+        )
+        out, err = self.run_import('posts', posts, batch_size=1)
+        self.assertIn('с ошибками: 2', out)
+        self.assertIn('Строка 3', err)
+        self.assertIn('нет пользователя ghost', err)
+        first = Post.objects.get(pk=100)
+        self.assertEqual(first.pub_date.year, 2001)
+        self.assertEqual(first.group.slug, 'group')
+
+        self.run_import('comments', self.jsonl('comments.jsonl', [
+            {'post': 100, 'author': 'anna', 'text': 'Комментарий'},
+            {'post': 999, 'author': 'anna', 'text': 'Мимо'},
+        ]))
+        self.run_import('follows', self.jsonl('follows.jsonl', [
+            {'user': 'anna', 'author': 'leo'},
+            {'user': 'leo', 'author': 'leo'},
+        ]))
+        anna = User.objects.get(username='anna')
+        self.assertEqual(Comment.objects.get().post_id, 100)
+        self.assertEqual(Post.objects.get(pk=100).comments_count, 1)
+        self.assertEqual(Follow.objects.get().user, anna)
+        self.assertEqual(
+            list(anna.timeline.values_list('post_id', flat=True)), [100]
+        )
+
+    def test_resume_after_interruption(self):
+        User.objects.create_user(username='leo')
+        path = self.jsonl('posts.jsonl', [
+            {'id': i, 'author': 'leo', 'text': f'Пост {i}'}
+            for i in range(1, 11)
+        ])
+        insert = import_data.Command.insert
+        calls = []
+
+        def failing_insert(command, model, objects, batch_size):
+            calls.append(len(objects))
+            if len(calls) == 3:
+                raise RuntimeError('Сбой')
+            insert(command, model, objects, batch_size)
+
+        with mock.patch.object(
+            import_data.Command, 'insert', failing_insert
+        ):
+            with self.assertRaises(RuntimeError):
+                self.run_import('posts', path, chunk=4, batch_size=2)
+        # Первая транзакция из 4 строк зафиксирована, вторая откатилась.
+        self.assertEqual(Post.objects.count(), 4)
+
+        out, _ = self.run_import('posts', path, chunk=4, batch_size=2)
+        self.assertIn('Продолжаю со строки 5', out)
+        self.assertEqual(
+            sorted(Post.objects.values_list('pk', flat=True)),
+            list(range(1, 11))
+        )
+        self.assertEqual(User.objects.get().stats.posts_count, 10)
+
+    def test_resume_does_not_duplicate_rows_without_ids(self):
+        User.objects.create_user(username='leo')
+        path = self.jsonl('posts.jsonl', [
+            {'author': 'leo', 'text': f'Пост {i}'} for i in range(1, 11)
+        ])
+        save_state = import_data.Command.save_state
+        calls = []
+
+        def failing_save_state(command, options, done):
+            calls.append(done)
+            if len(calls) == 2:
+                raise RuntimeError('Сбой')
+            save_state(command, options, done)
+
+        with mock.patch.object(
+            import_data.Command, 'save_state', failing_save_state
+        ):
+            with self.assertRaises(RuntimeError):
+                self.run_import('posts', path, chunk=4, batch_size=2)
+        # Транзакция зафиксирована, но позиция не записана.
+        self.assertEqual(Post.objects.count(), 4)
+
+        self.run_import('posts', path, chunk=4, batch_size=2)
+        self.assertEqual(
+            sorted(Post.objects.values_list('text', flat=True)),
+            sorted(f'Пост {i}' for i in range(1, 11))
+        )
+        self.assertEqual(
+            Post.objects.values('pub_date').distinct().count(), 1
+        )
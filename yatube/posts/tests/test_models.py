@@ -1,7 +1,11 @@
+import os
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Group, Post
+from .. import timeline
+from ..models import AuthorStats, Comment, Follow, Group, Post, TimelineEntry
 
 User = get_user_model()
 
@@ -30,3 +34,111 @@ class PostModelTest(TestCase):
         group = PostModelTest.group
         expected_object_name = group.title
         self.assertEqual(expected_object_name, str(group))
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Пост до подписки',
+        )
+
+    def test_timeline_follows_subscriptions(self):
+        reader = TimelineTest.reader
+        author = TimelineTest.author
+        Follow.objects.create(user=reader, author=author)
+        self.assertEqual(
+            list(reader.timeline.values_list('post', flat=True)),
+            [TimelineTest.old_post.pk],
+            'Посты автора не попали в ленту при подписке'
+        )
+
+        new_post = Post.objects.create(author=author, text='Новый пост')
+        self.assertEqual(
+            reader.timeline.first().post, new_post,
+            'Новый пост не попал в ленту подписчика'
+        )
+
+        reader.follower.filter(author=author).delete()
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=reader).exists(),
+            'Лента не очистилась после отписки'
+        )
+
+    def test_rebuild_only_given_readers(self):
+        other = User.objects.create_user(username='other')
+        for user in (TimelineTest.reader, other):
+            Follow.objects.create(user=user, author=TimelineTest.author)
+        TimelineEntry.objects.all().delete()
+        timeline.rebuild(User.objects.filter(pk=other.pk))
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user_id', flat=True)),
+            [other.pk]
+        )
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+
+    def expected(self):
+        author = CountersTest.author
+        return {
+            'posts_count': author.posts.count(),
+            'followers_count': author.following.count(),
+            'following_count': author.follower.count(),
+        }
+
+    def actual(self):
+        stats = AuthorStats.objects.get(user=CountersTest.author)
+        return {field: getattr(stats, field) for field in self.expected()}
+
+    def test_counters_follow_changes(self):
+        author = CountersTest.author
+        post = Post.objects.create(author=author, text='Пост')
+        Post.objects.create(author=author, text='Ещё пост')
+        Follow.objects.create(user=CountersTest.reader, author=author)
+        Follow.objects.create(user=author, author=CountersTest.reader)
+        comment = Comment.objects.create(
+            post=post, author=CountersTest.reader, text='Коммент'
+        )
+        self.assertEqual(self.actual(), self.expected())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+        comment.delete()
+        post.delete()
+        author.following.all().delete()
+        self.assertEqual(self.actual(), self.expected())
+
+    def test_deleted_user_comments_on_other_posts_are_counted(self):
+        post = Post.objects.create(author=CountersTest.author, text='Пост')
+        guest = User.objects.create_user(username='guest')
+        own = Post.objects.create(author=guest, text='Свой пост')
+        Comment.objects.create(post=post, author=guest, text='Чужой')
+        Comment.objects.create(post=own, author=guest, text='Свой')
+        guest.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertFalse(Post.objects.filter(pk=own.pk).exists())
+
+    def test_rebuild_counters_command(self):
+        author = CountersTest.author
+        post = Post.objects.create(author=author, text='Пост')
+        Comment.objects.create(post=post, author=author, text='Коммент')
+        Follow.objects.create(user=CountersTest.reader, author=author)
+        AuthorStats.objects.update(posts_count=100, followers_count=100)
+        Post.objects.update(comments_count=100)
+
+        call_command('rebuild_counters', stdout=open(os.devnull, 'w'))
+
+        self.assertEqual(self.actual(), self.expected())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
@@ -0,0 +1,78 @@
+import json
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.template import Context, Template, engines
+from django.template.loaders.cached import Loader
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..templatetags import post_cards
+
+User = get_user_model()
+
+
+class PostCardTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='пётр.и+к@', first_name='Пётр'
+        )
+        cls.group = Group.objects.create(
+            title='Группа', slug='test-slug', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='<b>раз</b>\nдва'
+        )
+
+    def render(self, source):
+        return Template('{% load post_cards %}' + source).render(
+            Context({'post': PostCardTests.post})
+        )
+
+    def test_url_matches_reverse(self):
+        for name, value in (
+            ('posts:profile', PostCardTests.user.username),
+            ('posts:post_detail', PostCardTests.post.pk),
+            ('posts:group_list', PostCardTests.group.slug),
+        ):
+            with self.subTest(name=name):
+                self.assertEqual(
+                    post_cards.url(name, value), reverse(name, args=[value])
+                )
+
+    def test_card(self):
+        html = self.render('{% post_card post %}')
+        self.assertIn(
+            reverse('posts:profile', args=[PostCardTests.user.username]), html
+        )
+        self.assertIn(
+            reverse('posts:post_detail', args=[PostCardTests.post.pk]), html
+        )
+        self.assertIn('<p>&lt;b&gt;раз&lt;/b&gt;<br>два</p>', html)
+        self.assertNotIn('все записи группы', html)
+
+    def test_group_link(self):
+        html = self.render('{% post_card post group_link=True %}')
+        self.assertIn(
+            f'<a href="{reverse("posts:group_list", args=["test-slug"])}">'
+            'все записи группы</a>',
+            html
+        )
+
+    def test_templates_are_cached_without_debug(self):
+        # Тесты идут с DEBUG = False.
+        loaders = engines['django'].engine.template_loaders
+        self.assertIsInstance(loaders[0], Loader)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_cards', pages=1, warmup=0, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(
+            set(report['per_card']),
+            {'inline', 'component', 'component_cached'}
+        )
@@ -0,0 +1,172 @@
+import json
+from io import StringIO
+
+from about import urls as about_urls
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from users import urls as users_urls
+
+from .. import urls
+from ..models import Comment, Follow, Group, Post
+from .utils import query_budget
+
+User = get_user_model()
+
+POSTS_ON_PAGE: int = 10
+
+
+class QueryBudgetTests(TestCase):
+    """Число запросов на каждой странице не зависит от числа постов."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='group',
+            description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(POSTS_ON_PAGE + 2):
+            author = User.objects.create_user(username=f'user{i}')
+            Follow.objects.create(user=cls.reader, author=author)
+            post = Post.objects.create(
+                text=f'Пост {i}',
+                author=author,
+                group=cls.group
+            )
+            Comment.objects.create(post=post, author=author, text='Коммент')
+        cls.post = Post.objects.create(
+            text='Пост автора',
+            author=cls.author,
+            group=cls.group
+        )
+        for i in range(POSTS_ON_PAGE):
+            commentator = User.objects.get(username=f'user{i}')
+            Comment.objects.create(
+                post=cls.post,
+                author=commentator,
+                text=f'Коммент {i}'
+            )
+
+        post_id = {'post_id': cls.post.id}
+        username = {'username': cls.author.username}
+        # Бюджет рассчитан на холодный кэш: чтение сессии и пользователя
+        # (2 запроса), которые при попадании в кэш не выполняются.
+        cls.budgets = {
+            'index': (reverse('posts:index'), 3),
+            'group_list': (
+                reverse('posts:group_list', kwargs={'slug': 'group'}), 4
+            ),
+            # С холодным кэшем рекомендаций: сохранённые и популярные.
+            'profile': (reverse('posts:profile', kwargs=username), 6),
+            'post_detail': (
+                reverse('posts:post_detail', kwargs=post_id), 4
+            ),
+            'post_comments': (
+                reverse('posts:post_comments', kwargs=post_id), 3
+            ),
+            'post_edit': (reverse('posts:post_edit', kwargs=post_id), 4),
+            'add_comment': (
+                reverse('posts:add_comment', kwargs=post_id), 3
+            ),
+            'post_create': (reverse('posts:post_create'), 3),
+            # Читатель не сотрудник: только проверка и перенаправление.
+            'export': (
+                reverse('posts:export', kwargs={'kind': 'posts'}), 2
+            ),
+            # Число найденных, id страницы из индекса и сами посты.
+            'search': (reverse('posts:search') + '?q=Пост', 5),
+            'follow_index': (reverse('posts:follow_index'), 3),
+            'profile_follow': (
+                reverse('posts:profile_follow', kwargs=username), 4
+            ),
+            'profile_unfollow': (
+                reverse('posts:profile_unfollow', kwargs=username), 8
+            ),
+            # Без сессии: API не обращается к request.user.
+            'api_index': (reverse('posts:api_index'), 2),
+            'api_group_list': (
+                reverse('posts:api_group_list', kwargs={'slug': 'group'}), 3
+            ),
+            'api_profile': (reverse('posts:api_profile', kwargs=username), 3),
+            'api_post_detail': (
+                reverse('posts:api_post_detail', kwargs=post_id), 2
+            ),
+            'api_post_comments': (
+                reverse('posts:api_post_comments', kwargs=post_id), 1
+            ),
+        }
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(QueryBudgetTests.reader)
+        self.author_client = Client()
+        self.author_client.force_login(QueryBudgetTests.author)
+
+    def test_every_view_has_budget(self):
+        names = {pattern.name for pattern in urls.urlpatterns}
+        self.assertEqual(
+            names - set(QueryBudgetTests.budgets), set(),
+            'Для этих страниц не задан бюджет запросов'
+        )
+
+    def test_views_stay_within_budget(self):
+        for name, (address, limit) in QueryBudgetTests.budgets.items():
+            client = (
+                self.author_client if name == 'post_edit'
+                else self.reader_client
+            )
+            with self.subTest(name=name):
+                with query_budget(limit):
+                    client.get(address)
+
+
+class ExplainFeedsTests(TestCase):
+
+    def test_feed_queries_use_indexes(self):
+        # Закэшированная лента не должна скрыть запросы от EXPLAIN.
+        Client().get(reverse('posts:index'))
+        out = StringIO()
+        call_command('explain_feeds', posts=200, users=10, stdout=out)
+        self.assertIn('SEARCH posts_post USING INDEX', out.getvalue())
+        index = out.getvalue().split('== index (')[1].split('== ')[0]
+        self.assertIn('FROM "posts_post"', index)
+        self.assertNotContains(
+            Client().get(reverse('posts:index')), '/profile/explain_'
+        )
+        self.assertFalse(
+            Post.objects.filter(text__startswith='explain_').exists(),
+            'Засеянные данные не откатились'
+        )
+
+
+class BenchmarkViewsTests(TestCase):
+
+    def test_benchmark_reports_every_route(self):
+        out = StringIO()
+        call_command(
+            'benchmark_views', users=5, groups=2, posts=20, comments=10,
+            images=1, requests=2, warmup=0, stdout=out
+        )
+        report = json.loads(out.getvalue())
+        routes = {
+            f'{module.app_name}:{pattern.name}'
+            for module in (urls, users_urls, about_urls)
+            for pattern in module.urlpatterns
+        }
+        self.assertEqual(set(report['views']), routes)
+        for name, view in report['views'].items():
+            with self.subTest(name=name):
+                self.assertLessEqual(view['p50_ms'], view['p99_ms'])
+        self.assertFalse(
+            User.objects.filter(username__startswith='bench_').exists(),
+            'Засеянные данные не откатились'
+        )
+        self.assertNotContains(
+            Client().get(reverse('posts:index')), '/profile/bench_'
+        )
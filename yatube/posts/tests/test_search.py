@@ -0,0 +1,108 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import counters, search
+from ..admin import PostAdmin
+from ..models import Comment, Post
+from ..views import POSTS_COUNT
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.cat = Post.objects.create(
+            text='Кошка спит на диване', author=cls.author
+        )
+        cls.dog = Post.objects.create(
+            text='Собака гуляет во дворе', author=cls.author
+        )
+        Comment.objects.create(
+            post=cls.dog, author=cls.author, text='А кошка смотрит в окно'
+        )
+
+    def setUp(self):
+        self.guest = Client()
+
+    def indexes(self):
+        python_index = search.PythonIndex()
+        return {'fts5': search.get_index(), 'python': python_index}
+
+    def test_post_match_ranks_above_comment_match(self):
+        for name, index in self.indexes().items():
+            with self.subTest(index=name):
+                self.assertEqual(
+                    index.ranked_ids('КОШК', 10),
+                    [SearchTests.cat.pk, SearchTests.dog.pk]
+                )
+                self.assertEqual(index.count('кошка диване'), 1)
+                self.assertEqual(index.count('!!!'), 0)
+
+    def test_signals_keep_index_in_sync(self):
+        index = search.get_index()
+        self.assertIsInstance(index, search.FTS5Index)
+        post = SearchTests.cat
+        post.text = 'Попугай поёт'
+        post.save()
+        self.assertEqual(index.ranked_ids('кошка', 10), [SearchTests.dog.pk])
+        self.assertEqual(index.ranked_ids('попугай', 10), [post.pk])
+        SearchTests.dog.comments.all().delete()
+        self.assertEqual(index.count('кошка'), 0)
+        SearchTests.dog.delete()
+        self.assertEqual(index.count('собака'), 0)
+
+    def test_deleting_post_drops_its_comments_at_once(self):
+        post = Post.objects.create(text='Пост', author=SearchTests.author)
+        for number in range(3):
+            Comment.objects.create(
+                post=post, author=SearchTests.author, text=f'Енот {number}'
+            )
+        python_index = search.PythonIndex()
+        python_index.rebuild()
+        python_index.remove_post_comments(post.pk)
+        with mock.patch.object(counters, 'change_comments') as change, \
+                mock.patch.object(search.FTS5Index, 'remove_comment') as drop:
+            post.delete()
+        change.assert_not_called()
+        drop.assert_not_called()
+        for name, index in (
+            ('fts5', search.get_index()), ('python', python_index)
+        ):
+            with self.subTest(index=name):
+                self.assertEqual(index.count('енот'), 0)
+                self.assertEqual(index.count('кошка'), 2)
+
+    def test_search_page_is_paginated(self):
+        Post.objects.bulk_create(
+            Post(text=f'Кошка номер {i}', author=SearchTests.author)
+            for i in range(POSTS_COUNT)
+        )
+        call_command('rebuild_search_index', stdout=StringIO())
+        address = reverse('posts:search')
+        response = self.guest.get(address, {'q': 'кошка'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.count, POSTS_COUNT + 2)
+        self.assertEqual(len(page_obj), POSTS_COUNT)
+        self.assertContains(response, 'page=2')
+        second = self.guest.get(address, {'q': 'кошка', 'page': 2})
+        found = second.context['page_obj'].object_list
+        self.assertEqual(len(found), 2)
+        # Совпадение только в комментарии - в самом конце.
+        self.assertEqual(found[-1], SearchTests.dog)
+
+    def test_admin_uses_index(self):
+        admin = PostAdmin(Post, None)
+        queryset, distinct = admin.get_search_results(
+            None, Post.objects.all(), 'собака'
+        )
+        self.assertFalse(distinct)
+        self.assertEqual(list(queryset), [SearchTests.dog])
@@ -0,0 +1,126 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import counters, follow_graph, suggestions
+from ..models import Follow, Suggestion
+from .utils import on_commit_callbacks
+
+User = get_user_model()
+
+
+class SuggestionsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        names = ('reader', 'b', 'c', 'd', 'e', 'other', 'g', 'newbie')
+        cls.users = {
+            name: User.objects.create_user(username=name) for name in names
+        }
+        for user, author in (
+            ('reader', 'b'), ('reader', 'c'),
+            ('b', 'd'), ('c', 'd'), ('c', 'e'),
+            ('other', 'b'), ('other', 'g'),
+        ):
+            Follow.objects.create(
+                user=cls.users[user], author=cls.users[author]
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.graph = follow_graph.FollowGraph()
+        self.graph.rebuild(None)
+
+    def pk(self, name):
+        return SuggestionsTests.users[name].pk
+
+    def test_friends_of_friends_rank_above_co_follows(self):
+        similar = suggestions.similar_authors(self.graph)
+        ranked = [
+            author_id for author_id, score in
+            suggestions.top(self.graph, similar, self.pk('reader'))
+        ]
+        # d - через двух авторов читателя, e - через одного, g читает
+        # тот, кто тоже подписан на b.
+        self.assertEqual(ranked, [self.pk('d'), self.pk('e'), self.pk('g')])
+
+    def test_refresh_replaces_rows(self):
+        stale = Suggestion.objects.create(
+            user=SuggestionsTests.users['newbie'],
+            author=SuggestionsTests.users['b'], score=1, rank=0
+        )
+        suggestions.refresh()
+        self.assertFalse(Suggestion.objects.filter(pk=stale.pk).exists())
+        self.assertEqual(
+            list(
+                Suggestion.objects.filter(user_id=self.pk('reader'))
+                .values_list('author_id', flat=True)
+            ),
+            [self.pk('d'), self.pk('e'), self.pk('g')]
+        )
+
+    def test_read_from_cache_without_queries(self):
+        suggestions.refresh()
+        first = suggestions.for_user(self.pk('reader'), self.graph)
+        with self.assertNumQueries(0):
+            second = suggestions.for_user(self.pk('reader'), self.graph)
+        self.assertEqual(first, second)
+        self.assertEqual(second[0]['username'], 'd')
+
+    def test_followed_authors_are_skipped_before_refresh(self):
+        suggestions.refresh()
+        Follow.objects.create(
+            user=SuggestionsTests.users['reader'],
+            author=SuggestionsTests.users['d']
+        )
+        graph = follow_graph.get_graph()
+        usernames = [
+            author['username']
+            for author in suggestions.for_user(self.pk('reader'), graph)
+        ]
+        self.assertEqual(usernames, ['e', 'g'])
+
+    def test_user_without_follows_gets_popular_authors(self):
+        counters.rebuild()
+        suggestions.refresh()
+        usernames = [
+            author['username']
+            for author in suggestions.for_user(self.pk('newbie'), self.graph)
+        ]
+        self.assertEqual(usernames[:2], ['b', 'd'])
+
+    def test_pages_show_suggestions(self):
+        suggestions.refresh()
+        client = Client()
+        client.force_login(SuggestionsTests.users['reader'])
+        for address in (
+            reverse('posts:profile', kwargs={'username': 'b'}),
+            reverse('posts:follow_index'),
+        ):
+            with self.subTest(address=address):
+                response = client.get(address)
+                self.assertContains(response, 'На кого подписаться')
+                self.assertEqual(
+                    response.context['suggestions'][0]['username'], 'd'
+                )
+
+    def test_profile_etag_follows_viewer_subscriptions(self):
+        client = Client()
+        client.force_login(SuggestionsTests.users['reader'])
+        address = reverse('posts:profile', kwargs={'username': 'b'})
+        etag = client.get(address)['ETag']
+        with on_commit_callbacks():
+            Follow.objects.create(
+                user=SuggestionsTests.users['reader'],
+                author=SuggestionsTests.users['e']
+            )
+        self.assertNotEqual(client.get(address)['ETag'], etag)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('refresh_suggestions', stdout=out)
+        self.assertIn('Рекомендаций: ', out.getvalue())
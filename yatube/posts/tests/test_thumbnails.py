@@ -0,0 +1,186 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import thumbnails
+from ..models import Post
+from .utils import on_commit_callbacks
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name='small.jpg'):
+    buffer = BytesIO()
+    Image.new('RGB', (40, 20), 'red').save(buffer, 'JPEG')
+    return ContentFile(buffer.getvalue(), name=name)
+
+
+def thumbnail_files():
+    cache_dir = os.path.join(TEMP_MEDIA_ROOT, 'cache')
+    return [
+        name for _, _, names in os.walk(cache_dir) for name in names
+    ]
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_generate_builds_every_geometry(self):
+        author = User.objects.create_user(username='author')
+        post = Post(text='Пост', author=author)
+        post.image.save('generate.jpg', make_image(), save=False)
+        before = len(thumbnail_files())
+        thumbnails.generate(post.image.name)
+        self.assertEqual(
+            len(thumbnail_files()) - before, len(thumbnails.all_variants())
+        )
+
+    def test_saved_post_builds_thumbnails_after_commit(self):
+        author = User.objects.create_user(username='author')
+        before = len(thumbnail_files())
+        with mock.patch.object(thumbnails, 'WORKERS', 0):
+            with on_commit_callbacks(execute=False) as callbacks:
+                post = Post(text='Пост', author=author)
+                post.image.save('commit.jpg', make_image())
+        self.assertEqual(len(thumbnail_files()), before)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(
+            len(thumbnail_files()) - before, len(thumbnails.all_variants())
+        )
+
+    def render_picture(self, post):
+        return Template(
+            '{% load post_thumbnails %}'
+            '{% post_picture thumbnails post "960x339" %}'
+        ).render(Context({'post': post, 'thumbnails': {}}))
+
+    def test_render_builds_only_base_variant(self):
+        author = User.objects.create_user(username='author')
+        post = Post(pk=1, text='Пост', author=author)
+        post.image.save('render.jpg', make_image(), save=False)
+        before = len(thumbnail_files())
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            html = self.render_picture(post)
+            self.render_picture(post)
+        self.assertEqual(len(thumbnail_files()) - before, 1)
+        self.assertIn('width="960"', html)
+        schedule.assert_called_once_with(post)
+
+    def test_missing_source_is_remembered(self):
+        post = SimpleNamespace(pk=1, image='posts/missing.jpg')
+        with self.assertLogs('posts.thumbnails', 'WARNING') as logs:
+            self.assertEqual(self.render_picture(post).strip(), '')
+        with mock.patch('sorl.thumbnail.images.ImageFile.exists') as exists:
+            self.assertEqual(self.render_picture(post).strip(), '')
+        exists.assert_not_called()
+        self.assertEqual(len(logs.records), 1)
+        self.assertTrue(thumbnails.source_missing('posts/missing.jpg'))
+
+    def test_prefetch_resolves_page_in_one_lookup(self):
+        author = User.objects.create_user(username='author')
+        posts = []
+        for i in range(3):
+            post = Post(text=f'Пост {i}', author=author)
+            post.image.save(f'prefetch{i}.jpg', make_image(), save=False)
+            post.save()
+            thumbnails.generate(post.image.name)
+            posts.append(post)
+        posts.append(Post.objects.create(text='Без картинки', author=author))
+        cache.clear()
+        with self.assertNumQueries(1):
+            found = thumbnails.prefetch(posts)
+        self.assertEqual(set(found), {
+            (post.pk, variant.geometry, variant.format)
+            for post in posts[:3]
+            for variant in thumbnails.all_variants()
+        })
+        with self.assertNumQueries(0):
+            thumbnails.prefetch(posts)
+
+        response = self.client.get(reverse('posts:index'))
+        for key, image in found.items():
+            with self.subTest(key=key):
+                self.assertContains(response, image.url)
+
+
+class PostPictureTests(TestCase):
+
+    def render(self, post, thumbnails):
+        template = Template(
+            '{% load post_thumbnails %}'
+            '{% post_picture thumbnails post "960x339" %}'
+        )
+        return template.render(
+            Context({'post': post, 'thumbnails': thumbnails})
+        )
+
+    def test_srcset_for_every_width_and_format(self):
+        post = SimpleNamespace(pk=1, image='posts/photo.jpg')
+        with mock.patch.object(thumbnails, 'FORMATS', ('WEBP', 'JPEG')):
+            found = {
+                (1, variant.geometry, variant.format): SimpleNamespace(
+                    url=f'/{variant.geometry}.{variant.format.lower()}'
+                )
+                for variant in thumbnails.variants('960x339')
+            }
+            html = self.render(post, found)
+        self.assertIn(
+            '<source type="image/webp" srcset="/480x170.webp 480w, '
+            '/960x339.webp 960w, /1440x508.webp 1440w" '
+            'sizes="(max-width: 960px) 100vw, 960px">',
+            html
+        )
+        self.assertIn('src="/960x339.jpeg"', html)
+        self.assertIn(
+            'srcset="/480x170.jpeg 480w, /960x339.jpeg 960w, '
+            '/1440x508.jpeg 1440w"',
+            html
+        )
+        for attribute in ('width="960"', 'height="339"', 'loading="lazy"'):
+            self.assertIn(attribute, html)
+
+    def test_post_without_image_renders_nothing(self):
+        post = SimpleNamespace(pk=1, image='')
+        self.assertEqual(self.render(post, {}).strip(), '')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class GenerateThumbnailsCommandTests(TransactionTestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_command_builds_missing_thumbnails(self):
+        author = User.objects.create_user(username='author')
+        for i in range(3):
+            post = Post(text=f'Пост {i}', author=author)
+            post.image.save(f'command{i}.jpg', make_image(), save=False)
+            Post.objects.bulk_create([post])
+        out = StringIO()
+        # В тестовой базе SQLite в памяти с общим кэшем параллельные
+        # записи сразу падают с 'table is locked', поэтому один поток.
+        call_command('generate_thumbnails', workers=1, stdout=out)
+        self.assertIn('Готово: 3, с ошибками: 0', out.getvalue())
@@ -0,0 +1,133 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import AuthorStats, Post
+from ..utils import (CountCachingPaginator, CursorPaginator, decode_cursor,
+                     encode_cursor)
+
+User = get_user_model()
+
+
+class CursorPaginatorTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        for i in range(13):
+            Post.objects.create(text=f'Пост {i}', author=cls.author)
+        cls.expected = list(Post.objects.order_by('-pub_date', '-id'))
+
+    def setUp(self):
+        self.guest = Client()
+
+    def test_cursor_roundtrip(self):
+        post = CursorPaginatorTests.expected[0]
+        self.assertEqual(
+            decode_cursor(encode_cursor(post.pub_date, post.pk)),
+            (post.pub_date, post.pk)
+        )
+        self.assertIsNone(decode_cursor('мусор'))
+        for pk in (0, 2 ** 63):
+            with self.subTest(pk=pk):
+                self.assertIsNone(
+                    decode_cursor(encode_cursor(post.pub_date, pk))
+                )
+
+    def test_out_of_range_cursor_opens_first_page(self):
+        cursor = encode_cursor(
+            CursorPaginatorTests.expected[0].pub_date, 10 ** 24
+        )
+        for name in ('posts:index', 'posts:api_index'):
+            with self.subTest(name=name):
+                response = self.guest.get(reverse(name), {'cursor': cursor})
+                self.assertEqual(response.status_code, 200)
+
+    def test_pages_forward_and_back(self):
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        first = paginator.get_cursor_page()
+        self.assertIs(type(first), Page)
+        self.assertEqual(list(first), CursorPaginatorTests.expected[:10])
+        self.assertIsNone(first.previous_cursor)
+
+        second = paginator.get_cursor_page(after=first.next_cursor)
+        self.assertEqual(list(second), CursorPaginatorTests.expected[10:])
+        self.assertIsNone(second.next_cursor)
+
+        back = paginator.get_cursor_page(before=second.previous_cursor)
+        self.assertEqual(list(back), CursorPaginatorTests.expected[:10])
+        self.assertIsNone(back.previous_cursor)
+
+    def test_cursor_page_does_not_count(self):
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        with self.assertNumQueries(1):
+            page = paginator.get_cursor_page()
+            len(page)
+
+    def test_index_cursor_and_old_page_links(self):
+        response = self.guest.get(reverse('posts:index'))
+        page = response.context['page_obj']
+        self.assertIsInstance(page.paginator, CursorPaginator)
+
+        response = self.guest.get(
+            reverse('posts:index') + f'?cursor={page.next_cursor}'
+        )
+        self.assertEqual(len(response.context['page_obj']), 3)
+
+        response = self.guest.get(reverse('posts:index') + '?page=2')
+        self.assertNotIsInstance(
+            response.context['page_obj'].paginator, CursorPaginator
+        )
+        page = response.context['page_obj']
+        self.assertIsInstance(page.paginator, Paginator)
+        self.assertEqual(len(page), 3)
+
+
+class CountCachingPaginatorTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        for i in range(13):
+            Post.objects.create(text=f'Пост {i}', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_count_is_cached(self):
+        paginator = CountCachingPaginator(Post.objects.all(), 10)
+        self.assertEqual(paginator.count, 13)
+        with self.assertNumQueries(0):
+            paginator = CountCachingPaginator(Post.objects.all(), 10)
+            self.assertEqual(paginator.num_pages, 2)
+
+    def test_known_count_skips_query(self):
+        with self.assertNumQueries(0):
+            paginator = CountCachingPaginator(Post.objects.all(), 10, 13)
+            self.assertEqual(paginator.num_pages, 2)
+
+    def test_profile_without_counters_counts_posts(self):
+        AuthorStats.objects.filter(
+            user=CountCachingPaginatorTests.author
+        ).delete()
+        response = Client().get(
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            {'page': 2}
+        )
+        self.assertEqual(response.context['posts_count'], 13)
+        self.assertEqual(len(response.context['page_obj']), 3)
+
+    def test_approximate_navigation(self):
+        with mock.patch('posts.utils.EXACT_COUNT_LIMIT', 5):
+            paginator = CountCachingPaginator(Post.objects.all(), 1)
+            page = paginator.get_page(7)
+            self.assertTrue(paginator.approximate)
+            self.assertEqual(list(page.page_window), list(range(4, 11)))
+            response = Client().get(reverse('posts:index') + '?page=7')
+        self.assertNotContains(response, 'Последняя')
@@ -1,9 +1,13 @@
 from django import forms
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import Client, TestCase
 from django.urls import reverse
 
-from ..models import Follow, Group, Post
+from .. import caching
+from ..models import Comment, Follow, Group, Post
+from ..views import COMMENTS_COUNT
+from .utils import on_commit_callbacks
 
 User = get_user_model()
 
@@ -279,3 +283,231 @@ class PostPagesTests(TestCase):
             (f'Количество подписчиков должно быть {count_follow + 1},'
              f'а вышло {Follow.objects.all().count()}')
         )
+
+
+class ListingCacheTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='group',
+            description='Описание'
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other_group',
+            description='Описание'
+        )
+        cls.post = Post.objects.create(
+            text='Исходный текст',
+            group=cls.group,
+            author=cls.author
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+
+    def test_listing_served_from_cache(self):
+        self.guest.get(reverse('posts:index'))
+        Post.objects.filter(pk=ListingCacheTests.post.pk).update(
+            text='Изменено в обход сигналов'
+        )
+        response = self.guest.get(reverse('posts:index'))
+        self.assertContains(response, 'Исходный текст')
+        self.assertNotContains(response, 'Изменено в обход сигналов')
+
+    def test_new_post_evicts_only_its_pages(self):
+        scopes = {
+            'index': caching.INDEX,
+            'group': caching.group_scope(ListingCacheTests.group.pk),
+            'profile': caching.profile_scope(ListingCacheTests.author.pk),
+            'other_group': caching.group_scope(
+                ListingCacheTests.other_group.pk
+            ),
+            'other_profile': caching.profile_scope(
+                ListingCacheTests.other.pk
+            ),
+        }
+        before = {
+            name: caching.listing_version(scope)
+            for name, scope in scopes.items()
+        }
+        with on_commit_callbacks():
+            Post.objects.create(
+                text='Новый пост',
+                group=ListingCacheTests.group,
+                author=ListingCacheTests.author
+            )
+        for name, scope in scopes.items():
+            with self.subTest(name=name):
+                changed = caching.listing_version(scope) != before[name]
+                self.assertEqual(changed, not name.startswith('other'))
+
+    def test_group_change_evicts_old_group_page(self):
+        address = reverse('posts:group_list', kwargs={
+            'slug': ListingCacheTests.group.slug
+        })
+        self.assertContains(self.guest.get(address), 'Исходный текст')
+        post = ListingCacheTests.post
+        post.group = ListingCacheTests.other_group
+        with on_commit_callbacks():
+            post.save()
+        self.assertNotContains(self.guest.get(address), 'Исходный текст')
+
+    def test_versions_change_only_on_commit(self):
+        before = caching.listing_version(caching.INDEX)
+        with on_commit_callbacks(execute=False) as callbacks:
+            Post.objects.create(
+                text='Ещё не зафиксирован', author=ListingCacheTests.author
+            )
+        self.assertEqual(caching.listing_version(caching.INDEX), before)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(caching.listing_version(caching.INDEX), before)
+
+
+class CommentsPaginationTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.author, text=f'Коммент {i}')
+            for i in range(COMMENTS_COUNT + 5)
+        )
+
+    def setUp(self):
+        self.guest = Client()
+
+    def test_post_detail_shows_first_comments(self):
+        response = self.guest.get(reverse('posts:post_detail', kwargs={
+            'post_id': CommentsPaginationTests.post.pk
+        }))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_COUNT)
+        self.assertEqual(comments[0].text, 'Коммент 0')
+        self.assertIsNotNone(comments.next_cursor)
+        self.assertContains(response, 'data-fragment')
+
+    def test_fragment_returns_next_comments(self):
+        address = reverse('posts:post_comments', kwargs={
+            'post_id': CommentsPaginationTests.post.pk
+        })
+        first = self.guest.get(address).context['comments']
+        response = self.guest.get(f'{address}?cursor={first.next_cursor}')
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            [f'Коммент {i}' for i in range(COMMENTS_COUNT, COMMENTS_COUNT + 5)]
+        )
+        self.assertIsNone(comments.next_cursor)
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertNotContains(response, 'data-fragment')
+
+
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='group',
+            description='Описание'
+        )
+        cls.post = Post.objects.create(
+            text='Пост',
+            group=cls.group,
+            author=cls.author
+        )
+        cls.pages = {
+            'index': reverse('posts:index'),
+            'group_list': reverse('posts:group_list', kwargs={
+                'slug': cls.group.slug
+            }),
+            'profile': reverse('posts:profile', kwargs={
+                'username': cls.author.username
+            }),
+            'post_detail': reverse('posts:post_detail', kwargs={
+                'post_id': cls.post.pk
+            }),
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+        self.reader = Client()
+        self.reader.force_login(ConditionalGetTests.reader)
+
+    def test_unchanged_page_is_not_modified(self):
+        for name, address in ConditionalGetTests.pages.items():
+            with self.subTest(name=name):
+                etag = self.guest.get(address)['ETag']
+                # Только поиск группы или автора по адресу страницы.
+                lookups = int(name in ('group_list', 'profile'))
+                with self.assertNumQueries(lookups):
+                    response = self.guest.get(
+                        address, HTTP_IF_NONE_MATCH=etag
+                    )
+                self.assertEqual(response.status_code, 304)
+
+    def test_guest_gets_last_modified(self):
+        address = ConditionalGetTests.pages['index']
+        modified = self.guest.get(address)['Last-Modified']
+        response = self.guest.get(address, HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(
+            self.reader.get(address).has_header('Last-Modified')
+        )
+
+    def test_etag_depends_on_viewer(self):
+        address = ConditionalGetTests.pages['index']
+        etag = self.guest.get(address)['ETag']
+        response = self.reader.get(address, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_changes_refresh_etag(self):
+        pages = ConditionalGetTests.pages
+        changes = (
+            (
+                'post_detail',
+                lambda: Comment.objects.create(
+                    post=ConditionalGetTests.post,
+                    author=ConditionalGetTests.reader,
+                    text='Комментарий'
+                )
+            ),
+            (
+                'group_list',
+                lambda: Post.objects.create(
+                    text='Новый',
+                    group=ConditionalGetTests.group,
+                    author=ConditionalGetTests.reader
+                )
+            ),
+            (
+                'profile',
+                lambda: Follow.objects.create(
+                    user=ConditionalGetTests.reader,
+                    author=ConditionalGetTests.author
+                )
+            ),
+        )
+        for name, change in changes:
+            with self.subTest(name=name):
+                etag = self.reader.get(pages[name])['ETag']
+                with on_commit_callbacks():
+                    change()
+                response = self.reader.get(
+                    pages[name], HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
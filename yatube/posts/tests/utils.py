@@ -0,0 +1,57 @@
+from contextlib import contextmanager
+from functools import wraps
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+@contextmanager
+def query_budget(limit, using=DEFAULT_DB_ALIAS):
+    """Падает, если внутри блока выполнено больше limit SQL-запросов.
+
+    В отличие от assertNumQueries проверяет верхнюю границу, поэтому
+    не ломается от запросов, которые бюджет уже учёл.
+    """
+    with CaptureQueriesContext(connections[using]) as context:
+        yield context
+    executed = len(context.captured_queries)
+    if executed > limit:
+        queries = '\n'.join(
+            f'{number}. {query["sql"]}'
+            for number, query in enumerate(context.captured_queries, 1)
+        )
+        raise AssertionError(
+            f'Превышен бюджет запросов: {executed} > {limit}\n{queries}'
+        )
+
+
+def with_query_budget(limit, using=DEFAULT_DB_ALIAS):
+    """Декоратор теста: весь тест должен уложиться в limit запросов."""
+    def decorator(test):
+        @wraps(test)
+        def wrapper(*args, **kwargs):
+            with query_budget(limit, using):
+                return test(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def on_commit_callbacks(execute=True, using=DEFAULT_DB_ALIAS):
+    """Собирает (и выполняет) on_commit-колбэки, поставленные в блоке.
+
+    TestCase не фиксирует транзакцию, поэтому сами колбэки не срабатывают;
+    это перенос captureOnCommitCallbacks из Django 3.2.
+    """
+    connection = connections[using]
+    start = len(connection.run_on_commit)
+    callbacks = []
+    try:
+        yield callbacks
+    finally:
+        callbacks[:] = [
+            func for sids, func in connection.run_on_commit[start:]
+        ]
+        if execute:
+            for callback in callbacks:
+                callback()
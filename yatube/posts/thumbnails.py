@@ -0,0 +1,265 @@
+"""Фоновая подготовка миниатюр картинок постов.
+
+Шаблоны лент строят миниатюры sorl-thumbnail лениво, и первый запрос,
+отрисовавший пост, платит за работу Pillow. Здесь миниатюры всех
+геометрий из POST_THUMBNAIL_GEOMETRIES строятся сразу после сохранения
+поста в локальном пуле потоков, вне цикла запрос-ответ.
+
+Для srcset у каждой геометрии есть варианты (variants): та же обрезка
+шириной из POST_THUMBNAIL_WIDTHS в каждом формате POST_THUMBNAIL_FORMATS,
+и клиент скачивает только нужную ему ширину и формат. WebP строится,
+только если Pillow собран с libwebp.
+
+prefetch разрешает миниатюры всех постов страницы одним get_many к
+KV-хранилищу sorl вместо отдельного обращения на каждый тег.
+
+Если миниатюры ещё нет, в запросе строится только основной вариант
+(build_now), остальные ставятся в пул (schedule_missing). Отсутствие
+файла-источника запоминается в кэше на MISSING_TIMEOUT секунд.
+"""
+import hashlib
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connections, transaction
+from django.utils.functional import SimpleLazyObject
+from PIL import features
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as CachedDBStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+logger = logging.getLogger(__name__)
+
+# Геометрии должны совпадать с теми, что шаблоны передают в post_picture,
+# иначе ключи sorl не совпадут и миниатюра будет построена заново.
+GEOMETRIES = getattr(settings, 'POST_THUMBNAIL_GEOMETRIES', (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+))
+WORKERS = getattr(settings, 'POST_THUMBNAIL_WORKERS', 2)
+WIDTHS = getattr(settings, 'POST_THUMBNAIL_WIDTHS', (480, 960, 1440))
+FORMATS = tuple(
+    fmt for fmt in getattr(
+        settings, 'POST_THUMBNAIL_FORMATS', ('WEBP', 'JPEG')
+    )
+    if fmt != 'WEBP' or features.check('webp')
+)
+DEFAULT_FORMAT = sorl_settings.THUMBNAIL_FORMAT
+MISSING_TIMEOUT = 60 * 60
+# Не чаще раза в столько секунд отрисовка ставит картинку в пул.
+QUEUED_TIMEOUT = 5 * 60
+
+Variant = namedtuple('Variant', 'base geometry format width height')
+
+_executor = None
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=WORKERS, thread_name_prefix='thumbnails'
+        )
+    return _executor
+
+
+def variants(base):
+    """Варианты геометрии base: все ширины в каждом формате.
+
+    Высота пропорциональна ширине, так что обрезка у всех одна. Сама base
+    в формате по умолчанию есть всегда - это src тега post_picture.
+    """
+    width, height = (int(side) for side in base.split('x'))
+    formats = list(FORMATS)
+    if DEFAULT_FORMAT not in formats:
+        formats.append(DEFAULT_FORMAT)
+    result = []
+    for fmt in formats:
+        for variant_width in sorted(set(WIDTHS) | {width}):
+            variant_height = round(height * variant_width / width)
+            result.append(Variant(
+                base, f'{variant_width}x{variant_height}', fmt,
+                variant_width, variant_height
+            ))
+    return result
+
+
+def all_variants():
+    return [variant for base, _ in GEOMETRIES for variant in variants(base)]
+
+
+def generate(name):
+    """Строит все варианты картинки. Уже построенные берутся из KV."""
+    for variant in all_variants():
+        get_thumbnail(name, variant.geometry, **variant_options(variant))
+
+
+def generate_logged(name):
+    """generate с ошибками в лог; True, если все миниатюры готовы."""
+    try:
+        generate(name)
+        return True
+    except Exception:
+        logger.exception('Не удалось построить миниатюры для %s', name)
+        return False
+
+
+def generate_in_worker(name):
+    """generate_logged для потока пула: потом закрывает соединения с БД."""
+    try:
+        return generate_logged(name)
+    finally:
+        connections.close_all()
+
+
+def schedule(post):
+    """Ставит миниатюры поста в очередь после фиксации транзакции."""
+    name = post.image.name
+    try:
+        if not name or not post.image.storage.exists(name):
+            return
+    except SuspiciousFileOperation:
+        logger.warning('Картинка поста %s вне MEDIA_ROOT: %s', post.pk, name)
+        return
+    if WORKERS:
+        transaction.on_commit(
+            lambda: executor().submit(generate_in_worker, name)
+        )
+    else:
+        # Без пула миниатюры строятся сразу после фиксации, в том же
+        # потоке (так в тестах, см. settings_test).
+        transaction.on_commit(lambda: generate_logged(name))
+
+
+def _source_key(kind, name):
+    digest = hashlib.md5(name.encode()).hexdigest()
+    return f'posts:thumbnails:{kind}:{digest}'
+
+
+def source_missing(image):
+    """Не нашёлся ли файл картинки при недавней попытке построения."""
+    return cache.get(_source_key('missing', ImageFile(image).name)) is not None
+
+
+def build_now(image, variant):
+    """Строит вариант картинки в запросе; None, если файла нет."""
+    source = ImageFile(image)
+    try:
+        exists = source.exists()
+    except SuspiciousFileOperation:
+        exists = False
+    if not exists:
+        logger.warning('Нет файла картинки %s', source.name)
+        cache.set(
+            _source_key('missing', source.name), True, MISSING_TIMEOUT
+        )
+        return None
+    return get_thumbnail(
+        source.name, variant.geometry, **variant_options(variant)
+    )
+
+
+def schedule_missing(post):
+    """schedule для недостающих при отрисовке вариантов, без повторов."""
+    key = _source_key('queued', ImageFile(post.image).name)
+    if cache.add(key, True, QUEUED_TIMEOUT):
+        schedule(post)
+
+
+def options_for(geometry):
+    """Опции sorl для геометрии из POST_THUMBNAIL_GEOMETRIES."""
+    return dict(dict(GEOMETRIES).get(geometry, {}))
+
+
+def variant_options(variant):
+    return {**options_for(variant.base), 'format': variant.format}
+
+
+def _thumbnail_key(source, geometry, options):
+    """Ключ KV-хранилища, под которым get_thumbnail ищет миниатюру.
+
+    Повторяет подготовку опций из ThumbnailBackend.get_thumbnail, но без
+    чтения файла: имя миниатюры зависит только от имени источника и опций.
+    """
+    backend = default.backend
+    options = dict(options)
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return add_prefix(ImageFile(name, default.storage).key)
+
+
+def _get_many(keys):
+    """Сырые значения KV: один get_many к кэшу и один запрос за промахами."""
+    kv_cache = default.kvstore.cache
+    values = kv_cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        found = dict(
+            KVStoreModel.objects.filter(key__in=missing)
+            .values_list('key', 'value')
+        )
+        kv_cache.set_many(
+            {key: found.get(key, EMPTY_VALUE) for key in missing},
+            sorl_settings.THUMBNAIL_CACHE_TIMEOUT
+        )
+        values.update(found)
+    return {
+        key: value for key, value in values.items()
+        if value and value != EMPTY_VALUE
+    }
+
+
+def prefetch(posts):
+    """Готовые миниатюры постов: {(post.pk, geometry, format): ImageFile}.
+
+    Ещё не построенных миниатюр в словаре нет - их построит тег
+    post_picture.
+    """
+    return prefetch_images((post.pk, post.image) for post in posts)
+
+
+def prefetch_images(images):
+    """prefetch по парам (pk, картинка); картинка - файл поля или имя.
+
+    Для хранилищ, отличных от cached_db, и при THUMBNAIL_PRESERVE_FORMAT
+    (нужно читать файл) возвращает пустой словарь.
+    """
+    if (
+        not isinstance(default.kvstore, CachedDBStore)
+        or sorl_settings.THUMBNAIL_PRESERVE_FORMAT
+    ):
+        return {}
+    wanted = {}
+    for pk, image in images:
+        if not image:
+            continue
+        source = ImageFile(image)
+        for variant in all_variants():
+            key = _thumbnail_key(
+                source, variant.geometry, variant_options(variant)
+            )
+            wanted[key] = (pk, variant.geometry, variant.format)
+    if not wanted:
+        return {}
+    return {
+        wanted[key]: deserialize_image_file(value)
+        for key, value in _get_many(list(wanted)).items()
+    }
+
+
+def lazy_prefetch(posts):
+    """prefetch, выполняемый при первом обращении из шаблона."""
+    return SimpleLazyObject(lambda: prefetch(posts))
@@ -0,0 +1,82 @@
+from itertools import islice
+
+from django.db import connection, transaction
+
+from .models import Follow, Post, TimelineEntry
+
+BATCH_SIZE: int = 1000
+
+
+def _bulk_insert(entries):
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, BATCH_SIZE))
+        if not batch:
+            return
+        TimelineEntry.objects.bulk_create(batch)
+
+
+def fan_out(post):
+    """Раскладывает новый пост в ленты всех подписчиков автора."""
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id', flat=True
+    )
+    with transaction.atomic():
+        _bulk_insert(
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post.pk,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for user_id in followers.iterator()
+        )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту читателя все посты автора после подписки."""
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'id', 'pub_date'
+    )
+    with transaction.atomic():
+        _bulk_insert(
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for post_id, pub_date in posts.iterator()
+        )
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты читателя посты автора после отписки."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild(users=None):
+    """Пересобирает ленты одним INSERT ... SELECT.
+
+    Нужен после массовой загрузки через bulk_create, которая обходит
+    сигналы fan_out и backfill. users - queryset читателей, чьи ленты
+    пересобрать; по умолчанию все.
+    """
+    entries = TimelineEntry._meta.db_table
+    follows = Follow._meta.db_table
+    posts = Post._meta.db_table
+    sql = (
+        f'INSERT INTO {entries} (user_id, post_id, author_id, pub_date) '
+        f'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+        f'FROM {follows} f JOIN {posts} p ON p.author_id = f.author_id'
+    )
+    params = ()
+    stale = TimelineEntry.objects.all()
+    if users is not None:
+        users = users.values('pk')
+        subquery, params = users.query.sql_with_params()
+        sql += f' WHERE f.user_id IN ({subquery})'
+        stale = stale.filter(user__in=users)
+    with transaction.atomic(), connection.cursor() as cursor:
+        stale.delete()
+        cursor.execute(sql, params)
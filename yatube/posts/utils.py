@@ -1,9 +1,176 @@
-from django.core.paginator import Paginator
+import base64
+from hashlib import md5
 
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import SimpleLazyObject, cached_property
 
-def my_paginator(request, post_list, post_per_page=10):
+# Сколько секунд живёт закэшированное число строк для пагинатора.
+COUNT_CACHE_TIMEOUT = getattr(settings, 'PAGINATOR_COUNT_TIMEOUT', 60)
+# Выше этого числа строк навигация показывает окно страниц без последней.
+EXACT_COUNT_LIMIT = getattr(settings, 'PAGINATOR_EXACT_COUNT_LIMIT', 10000)
+# Сколько соседних страниц показывать по обе стороны от текущей.
+PAGE_WINDOW = 3
+# Наибольший id, который помещается в INTEGER базы.
+MAX_PK = 2 ** 63 - 1
 
-    paginator = Paginator(post_list, post_per_page)
+
+def encode_cursor(pub_date, pk):
+    """Упаковывает ключ (pub_date, id) в строку для адресной строки."""
+    raw = f'{pub_date.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    """Распаковывает курсор. Для битого курсора возвращает None."""
+    if not value:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+        pub_date, pk = raw.decode().split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if pub_date is None or not 1 <= pk <= MAX_PK:
+        return None
+    return pub_date, pk
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (pub_date, id).
+
+    Не выполняет ни COUNT(*), ни OFFSET: каждая страница - один запрос
+    с условием на ключ и LIMIT per_page + 1. Вместо номеров страниц
+    отдаёт курсоры next_cursor и previous_cursor.
+    """
+    keyset = True
+
+    def __init__(self, object_list, per_page, key=('pub_date', 'id'),
+                 descending=True, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.key = key
+        self.descending = descending
+
+    def _key_of(self, row):
+        if isinstance(row, dict):
+            return tuple(row[field] for field in self.key)
+        return tuple(getattr(row, field) for field in self.key)
+
+    def _seek(self, cursor, forward):
+        """Выборка строк строго после курсора в направлении обхода."""
+        date_field, pk_field = self.key
+        ordering = (date_field, pk_field)
+        if self.descending == forward:
+            ordering = tuple(f'-{field}' for field in ordering)
+        queryset = self.object_list.order_by(*ordering)
+        if cursor is None:
+            return queryset
+        pub_date, pk = cursor
+        lookup = 'lt' if ordering[0].startswith('-') else 'gt'
+        return queryset.filter(
+            Q(**{f'{date_field}__{lookup}': pub_date})
+            | Q(**{date_field: pub_date, f'{pk_field}__{lookup}': pk})
+        )
+
+    def get_cursor_page(self, after=None, before=None):
+        """Страница после курсора after или перед курсором before."""
+        after = decode_cursor(after)
+        before = None if after else decode_cursor(before)
+        forward = before is None
+        rows = list(
+            self._seek(after if forward else before, forward)
+            [:self.per_page + 1]
+        )
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+
+        page = Page(rows, None, self)
+        has_next = has_more if forward else True
+        has_previous = after is not None if forward else has_more
+        page.next_cursor = (
+            encode_cursor(*self._key_of(rows[-1]))
+            if rows and has_next else None
+        )
+        page.previous_cursor = (
+            encode_cursor(*self._key_of(rows[0]))
+            if rows and has_previous else None
+        )
+        return page
+
+
+class CountCachingPaginator(Paginator):
+    """Пагинатор, не выполняющий COUNT(*) на каждый запрос.
+
+    Число строк берётся из аргумента count (например, из денормализованных
+    счётчиков) или из кэша с коротким TTL, ключ которого - текст запроса.
+    Если строк больше EXACT_COUNT_LIMIT, пагинатор помечается как
+    approximate, и шаблон показывает только окно соседних страниц.
+    """
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._known_count = count
+
+    def _exact_count(self):
+        try:
+            return self.object_list.count()
+        except (AttributeError, TypeError):
+            return len(self.object_list)
+
+    @cached_property
+    def count(self):
+        if self._known_count is not None:
+            return self._known_count
+        query = getattr(self.object_list, 'query', None)
+        if query is None:
+            return self._exact_count()
+        key = 'paginator:count:' + md5(str(query).encode()).hexdigest()
+        return cache.get_or_set(key, self._exact_count, COUNT_CACHE_TIMEOUT)
+
+    @property
+    def approximate(self):
+        return self.count > EXACT_COUNT_LIMIT
+
+    def get_page(self, number):
+        page = super().get_page(number)
+        page.page_window = range(
+            max(1, page.number - PAGE_WINDOW),
+            min(self.num_pages, page.number + PAGE_WINDOW) + 1
+        )
+        return page
+
+
+def my_paginator(request, post_list, post_per_page=10, count=None):
+    """Страница ленты.
+
+    Старые ссылки вида ?page=N обслуживает CountCachingPaginator, всё
+    остальное - курсорная пагинация (?cursor=... / ?before=...).
+    count - заранее известное число строк, если оно есть.
+    """
     page_number = request.GET.get('page')
+    if page_number is not None:
+        paginator = CountCachingPaginator(post_list, post_per_page, count)
+        return paginator.get_page(page_number)
+
+    paginator = CursorPaginator(post_list, post_per_page)
+    return paginator.get_cursor_page(
+        after=request.GET.get('cursor'),
+        before=request.GET.get('before'),
+    )
+
+
+def lazy_paginator(request, post_list, post_per_page=10, count=None):
+    """my_paginator, откладывающий запрос до первого обращения к странице.
 
-    return paginator.get_page(page_number)
+    Если фрагмент ленты нашёлся в кэше, шаблон к странице не обращается
+    и запрос к базе не выполняется вовсе.
+    """
+    return SimpleLazyObject(
+        lambda: my_paginator(request, post_list, post_per_page, count)
+    )
@@ -1,64 +1,143 @@
+from urllib.parse import urlencode
+
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
+from . import caching, export, follow_graph, suggestions, thumbnails
+from .conditional import (conditional_page, group_scope, index_scope,
+                          page_group, page_profile, post_scope, profile_scope)
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .utils import my_paginator
+from .images import limited_uploads
+from .models import Comment, Follow, Post, User
+from .search import SearchResults
+from .utils import (CountCachingPaginator, CursorPaginator, lazy_paginator,
+                    my_paginator)
 
 POSTS_COUNT: int = 10
+COMMENTS_COUNT: int = 20
+EXPORT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
 
 
+@conditional_page(index_scope)
 def index(request):
-    posts = Post.objects.all()
+    posts = Post.objects.select_related('author', 'group')
 
+    page_obj = lazy_paginator(request, posts, POSTS_COUNT)
     context = {
-        'page_obj': my_paginator(request, posts, POSTS_COUNT)
+        'page_obj': page_obj,
+        'thumbnails': thumbnails.lazy_prefetch(page_obj),
+        'cache_version': caching.listing_version(caching.INDEX),
     }
     return render(request, 'posts/index.html', context)
 
 
+@conditional_page(group_scope)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
+    group = page_group(request, slug)
 
-    posts = group.posts.all()
+    posts = group.posts.select_related('author')
+    page_obj = lazy_paginator(request, posts, POSTS_COUNT)
 
     context = {
         'group': group,
-        'page_obj': my_paginator(request, posts, POSTS_COUNT),
+        'page_obj': page_obj,
+        'thumbnails': thumbnails.lazy_prefetch(page_obj),
+        'cache_version': caching.listing_version(
+            caching.group_scope(group.pk)
+        ),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional_page(profile_scope)
 def profile(request, username):
-    profile = get_object_or_404(User, username=username)
+    profile = page_profile(request, username)
+    stats = getattr(profile, 'stats', None)
     guest = request.user
-    following = (
-        guest.is_authenticated
-        and guest.follower.filter(user=guest, author=profile).exists()
-    )
-    posts = profile.posts.all()
+    following, suggested = False, []
+    if guest.is_authenticated:
+        graph = follow_graph.get_graph()
+        following = graph.follows(guest.pk, profile.pk)
+        suggested = suggestions.for_user(guest.pk, graph)
+    posts = profile.posts.select_related('group')
+    # Без строки счётчиков пагинатор берёт COUNT из кэша: нулевой count
+    # сделал бы все страницы после первой пустыми.
+    posts_count = stats.posts_count if stats else None
+    page_obj = lazy_paginator(request, posts, POSTS_COUNT, posts_count)
+    if posts_count is None:
+        posts_count = CountCachingPaginator(posts, POSTS_COUNT).count
 
     context = {
         'profile': profile,
-        'page_obj': my_paginator(request, posts, POSTS_COUNT),
-        'following': following
+        'page_obj': page_obj,
+        'thumbnails': thumbnails.lazy_prefetch(page_obj),
+        'following': following,
+        'suggestions': suggested,
+        'posts_count': posts_count,
+        'stats': stats,
+        'cache_version': caching.listing_version(
+            caching.profile_scope(profile.pk)
+        ),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@conditional_page(post_scope)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), id=post_id
+    )
     context = {
         'post': post,
-        'comments': post.comments.all(),
-        'form': CommentForm()
+        'post_id': post.pk,
+        'comments': comments_page(request, post.pk),
+        'form': CommentForm(),
+        'thumbnails': thumbnails.lazy_prefetch([post]),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def comments_page(request, post_id):
+    """Порция комментариев поста после курсора ?cursor=..."""
+    comments = Comment.objects.filter(post_id=post_id).select_related('author')
+    paginator = CursorPaginator(comments, COMMENTS_COUNT, descending=False)
+    return paginator.get_cursor_page(after=request.GET.get('cursor'))
+
+
+def post_comments(request, post_id):
+    """Следующая порция комментариев поста для подгрузки на странице."""
+    context = {
+        'post_id': post_id,
+        'comments': comments_page(request, post_id),
+    }
+    return render(request, 'includes/comment_list.html', context)
+
+
+def post_search(request):
+    """Посты и комментарии по запросу ?q=..., лучшие совпадения первыми."""
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        paginator = CountCachingPaginator(SearchResults(query), POSTS_COUNT)
+        page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+        'thumbnails': thumbnails.lazy_prefetch(page_obj or []),
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@limited_uploads
 @login_required
 def post_create(request):
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
@@ -68,10 +147,11 @@ def post_create(request):
                                                       'is_edit': False})
 
 
+@limited_uploads
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
-    if post.author != request.user:
+    if post.author_id != request.user.id:
         return redirect('posts:post_detail', post_id=post_id)
 
     form = PostForm(
@@ -104,8 +184,20 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    context = {'page_obj': my_paginator(request, posts, POSTS_COUNT)}
+    entries = request.user.timeline.select_related(
+        'post__author', 'post__group'
+    )
+    graph = follow_graph.get_graph()
+    if not graph.following(request.user.pk):
+        # Без подписок лента пуста: страница без запросов к ленте.
+        entries = entries.none()
+    page_obj = my_paginator(request, entries, POSTS_COUNT)
+    page_obj.object_list = [entry.post for entry in page_obj]
+    context = {
+        'page_obj': page_obj,
+        'suggestions': suggestions.for_user(request.user.pk, graph),
+        'thumbnails': thumbnails.lazy_prefetch(page_obj),
+    }
     return render(request, 'posts/follow.html', context)
 
 
@@ -114,7 +206,7 @@ def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if (
         request.user == author
-        or Follow.objects.filter(user=request.user, author=author).exists()
+        or follow_graph.get_graph().follows(request.user.pk, author.pk)
     ):
         return redirect('posts:profile', username=username)
     Follow.objects.create(user=request.user, author=author)
@@ -126,3 +218,26 @@ def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     request.user.follower.filter(author=author).delete()
     return redirect('posts:profile', username=username)
+
+
+@staff_member_required
+def export_data(request, kind):
+    """Выгрузка для аналитики потоком, без сборки файла в памяти."""
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in export.FORMATS:
+        return HttpResponseBadRequest(f'Неизвестный формат {fmt}')
+    try:
+        rows = export.rows(
+            kind,
+            author=request.GET.get('author'),
+            group=request.GET.get('group'),
+            since=request.GET.get('since'),
+            until=request.GET.get('until'),
+        )
+    except export.ExportError as error:
+        return HttpResponseBadRequest(str(error))
+    response = StreamingHttpResponse(
+        export.lines(kind, fmt, rows), content_type=EXPORT_TYPES[fmt]
+    )
+    response['Content-Disposition'] = f'attachment; filename="{kind}.{fmt}"'
+    return response
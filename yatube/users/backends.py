@@ -0,0 +1,32 @@
+"""Бэкенд аутентификации с кэшем пользователя.
+
+AuthenticationMiddleware на каждый запрос достаёт пользователя по id из
+сессии. CachedModelBackend берёт его из кэша, а запись сбрасывают сигналы
+users.signals: при сохранении пользователя (в том числе при смене пароля
+и обновлении last_login) и удалении - ещё раз после фиксации, - а также
+при выходе.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+USER_KEY = 'users:user:{}'
+# Сколько секунд пользователь живёт в кэше без изменений.
+USER_CACHE_TIMEOUT = getattr(settings, 'USER_CACHE_TIMEOUT', 300)
+
+
+def forget_user(user_id):
+    cache.delete(USER_KEY.format(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+
+    def get_user(self, user_id):
+        key = USER_KEY.format(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(key, user, USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
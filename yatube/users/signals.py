@@ -0,0 +1,25 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import forget_user
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    # И сразу, и после фиксации: между ними параллельный запрос может
+    # вернуть в кэш старую запись (с прежним паролем или is_active).
+    user_id = instance.pk
+    forget_user(user_id)
+    transaction.on_commit(lambda: forget_user(user_id))
+
+
+@receiver(user_logged_out)
+def user_logged_out_forget(sender, request, user, **kwargs):
+    if user is not None:
+        forget_user(user.pk)
@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.tests.utils import on_commit_callbacks
+
+from ..backends import USER_KEY, CachedModelBackend
+
+User = get_user_model()
+
+
+class CachedUserTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='user', password='old-Pa55word'
+        )
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.key = USER_KEY.format(self.user.pk)
+
+    def test_warm_request_has_no_auth_queries(self):
+        address = reverse('about:author')
+        self.client.get(address)
+        with self.assertNumQueries(0):
+            response = self.client.get(address)
+        self.assertEqual(response.context['user'], self.user)
+
+    def test_user_save_drops_cached_user(self):
+        backend = CachedModelBackend()
+        backend.get_user(self.user.pk)
+        self.assertIsNotNone(cache.get(self.key))
+        self.user.first_name = 'Новое имя'
+        with on_commit_callbacks(execute=False) as callbacks:
+            self.user.save()
+        self.assertIsNone(cache.get(self.key))
+        # Параллельный запрос до COMMIT вернул старую запись в кэш.
+        cache.set(self.key, User(pk=self.user.pk, first_name='Старое'))
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(cache.get(self.key))
+        self.assertEqual(
+            backend.get_user(self.user.pk).first_name, 'Новое имя'
+        )
+
+    def test_inactive_user_is_not_returned(self):
+        backend = CachedModelBackend()
+        backend.get_user(self.user.pk)
+        cached = cache.get(self.key)
+        cached.is_active = False
+        cache.set(self.key, cached)
+        self.assertIsNone(backend.get_user(self.user.pk))
+
+    def test_password_change_and_logout_drop_cached_user(self):
+        self.client.get(reverse('about:author'))
+        with on_commit_callbacks():
+            response = self.client.post(
+                reverse('users:password_change'), {
+                    'old_password': 'old-Pa55word',
+                    'new_password1': 'new-Pa55word',
+                    'new_password2': 'new-Pa55word',
+                }
+            )
+        self.assertEqual(response.status_code, 302)
+        # Сессия обновлена под новый пароль, пользователь не разлогинен.
+        response = self.client.get(reverse('about:author'))
+        self.assertTrue(response.context['user'].is_authenticated)
+        self.assertTrue(
+            cache.get(self.key).check_password('new-Pa55word')
+        )
+
+        self.client.get(reverse('users:logout'))
+        self.assertIsNone(cache.get(self.key))
+
+    def test_sessions_of_model_backend_still_load(self):
+        client = Client()
+        client.force_login(
+            self.user, backend='django.contrib.auth.backends.ModelBackend'
+        )
+        response = client.get(reverse('about:author'))
+        self.assertEqual(response.context['user'], self.user)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -29,6 +30,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -36,6 +38,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ViewTimingMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -46,6 +49,9 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
+        # Без DEBUG Django сам оборачивает загрузчики в кэширующий, и
+        # шаблоны разбираются один раз на процесс; при DEBUG правки
+        # шаблонов видны без перезапуска dev-сервера.
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -107,8 +113,74 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Сессии читаются из кэша, база - только при промахе и на запись.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Пользователь для AuthenticationMiddleware тоже берётся из кэша.
+# ModelBackend остаётся для сессий, открытых до появления кэша: в них
+# записан путь к нему, и без него эти пользователи оказались бы
+# разлогинены.
+AUTHENTICATION_BACKENDS = [
+    'users.backends.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+USER_CACHE_TIMEOUT = 300
+
+# Общий для всех воркеров кэш в файле SQLite (core/cache.py). Файл
+# лежит вне дерева проекта; путь задаётся переменной YATUBE_CACHE_PATH.
+CACHE_PATH = os.environ.get(
+    'YATUBE_CACHE_PATH',
+    os.path.join(tempfile.gettempdir(), 'yatube', 'cache.sqlite3')
+)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': CACHE_PATH,
+        'OPTIONS': {'MAX_ENTRIES': 100000},
     }
 }
+
+PAGINATOR_COUNT_TIMEOUT = 60
+PAGINATOR_EXACT_COUNT_LIMIT = 10000
+
+POST_THUMBNAIL_GEOMETRIES = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+# 0 - строить миниатюры без пула, сразу после фиксации.
+POST_THUMBNAIL_WORKERS = 2
+# Ширины и форматы вариантов для srcset (WebP - если Pillow его умеет).
+POST_THUMBNAIL_WIDTHS = (480, 960, 1440)
+POST_THUMBNAIL_FORMATS = ('WEBP', 'JPEG')
+
+# Картинки постов: предел загрузки и нормализация (posts/images.py).
+POST_IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 50_000_000
+POST_IMAGE_MAX_SIDE = 2048
+POST_IMAGE_QUALITY = 85
+
+PERFORMANCE_SAMPLE_RATE = 1.0
+PERFORMANCE_LOG_MIN_MS = 100
+PERFORMANCE_SLOW_MS = 500
+PERFORMANCE_SERVER_TIMING = True
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.performance': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'posts.images': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
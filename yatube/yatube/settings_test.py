@@ -0,0 +1,36 @@
+"""Настройки тестов.
+
+pytest берёт их из pytest.ini, тесты Django запускаются так:
+
+    python manage.py test --settings=yatube.settings_test
+"""
+from .settings import *  # noqa: F401, F403
+
+# Тесты чистят кэш, поэтому получают свой в памяти процесса, а не файл,
+# который читает живой сайт.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'yatube-tests',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    }
+}
+# Миниатюры строятся без пула, сразу после фиксации: потоки пула
+# переживали бы тест и писали в уже удалённый MEDIA_ROOT.
+POST_THUMBNAIL_WORKERS = 0
+# Строки замеров запросов и предупреждения о картинках не нужны в выводе
+# тестов; assertLogs ставит свой обработчик и видит их и так.
+LOGGING = {
+    **LOGGING,  # noqa: F405
+    'handlers': {
+        **LOGGING['handlers'],  # noqa: F405
+        'null': {'class': 'logging.NullHandler'},
+    },
+    'loggers': {
+        **LOGGING['loggers'],  # noqa: F405
+        **{
+            name: {'handlers': ['null'], 'propagate': False}
+            for name in ('core.performance', 'posts', 'posts.images')
+        },
+    },
+}
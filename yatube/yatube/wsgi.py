@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# Граф подписок собирается при старте, а не на первом запросе воркера.
+from posts import follow_graph  # noqa: E402
+
+follow_graph.warm_up()